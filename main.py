@@ -1,241 +1,164 @@
-from flask import Flask
+from flask import Flask, request, jsonify
 from flask_socketio import SocketIO
-import pykinect_azure as pykinect
+import os
+import signal
+import sys
 import threading
-import collections
-import time
-import numpy as np
-import math
+
+from utils import emitQueueUtil, metricsUtil, readinessUtil, traceUtil
+
+# pipeline / sensors（連帶 pykinect、numpy、cv2）由背景啟動執行緒 import：
+# 伺服器先 bind 讓 kiosk 畫面立刻可用，SDK / 裝置 / 追蹤器在背景初始化，狀態見 /ready
+pipeline = None
+sensors = None
 
 app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
-
-# --- 初始化 SDK ---
-try:
-    pykinect.initialize_libraries(track_body=True)
-except Exception as e:
-    print(f"❌ SDK 初始化失敗: {e}")
-
-# 攝影機優化設定
-device_config = pykinect.default_configuration
-device_config.color_resolution = pykinect.K4A_COLOR_RESOLUTION_720P
-device_config.depth_mode = pykinect.K4A_DEPTH_MODE_NFOV_2X2BINNED
-device_config.camera_fps = pykinect.K4A_FRAMES_PER_SECOND_30
-
-# 啟動裝置
-try:
-    device = pykinect.start_device(config=device_config)
-    bodyTracker = pykinect.start_body_tracker(pykinect.K4ABT_TRACKER_PROCESSING_MODE_GPU)
-except Exception as e:
-    print(f"❌ 硬體啟動失敗: {e}")
-
-# 骨架數據共享（Condition 保護，解決 race condition 與 GIL 競爭）
-skeleton_condition = threading.Condition()
-latest_skeleton_3d = None
-
-isHandUp = False
-isKicking = False
-
-# 多幀平滑設定
-SMOOTH_WINDOW = 5     # 滑動窗口幀數
-SMOOTH_THRESHOLD = 3  # 需幾幀確認才觸發
-
-FRAME_INTERVAL = 1.0 / 30  # 幀率限制，對應設定的 30fps
-
-# 踢腿門檻（mm）
-KICK_REL_THRESHOLD = 650    # 觸發：腳踝與髖部垂直距離小於此值
-KICK_RESET_THRESHOLD = 700  # 重置：兩腳都須大於此值（縮小滯後帶，原為 700mm）
-KNEE_ANGLE_THRESHOLD = 160  # 膝蓋角度門檻（度），大於此值才算前踢（過濾高抬腿）
-
-
-def calc_knee_angle(skeleton, side='left'):
-    if side == 'left':
-        hip   = skeleton[pykinect.K4ABT_JOINT_HIP_LEFT, :3]
-        knee  = skeleton[pykinect.K4ABT_JOINT_KNEE_LEFT, :3]
-        ankle = skeleton[pykinect.K4ABT_JOINT_ANKLE_LEFT, :3]
-    else:
-        hip   = skeleton[pykinect.K4ABT_JOINT_HIP_RIGHT, :3]
-        knee  = skeleton[pykinect.K4ABT_JOINT_KNEE_RIGHT, :3]
-        ankle = skeleton[pykinect.K4ABT_JOINT_ANKLE_RIGHT, :3]
-    v1 = hip - knee
-    v2 = ankle - knee
-    cos_a = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-6)
-    return np.degrees(np.arccos(np.clip(cos_a, -1.0, 1.0)))
-
-
-def get_closest_body(body_frame):
-    num_bodies = body_frame.get_num_bodies()
-    if num_bodies == 0:
-        return None
-    min_z = float('inf')
-    closest_id = None
-    for body_id in range(num_bodies):
-        body = body_frame.get_body(body_id)
-        skeleton_3d = body.numpy()
-        spine_z = skeleton_3d[pykinect.K4ABT_JOINT_SPINE_NAVEL, 2]
-        if spine_z < min_z:
-            min_z = spine_z
-            closest_id = body_id
-    return closest_id
-
-
-def kinect_data_acquisition_worker():
-    """【1. 資料獲取 Worker】負責抓取硬體數據，並通知偵測 workers"""
-    global latest_skeleton_3d
-    last_status = False
-    last_frame_time = 0.0
-
-    while True:
-        # 幀率限制：確保不超過 30fps，避免 body tracker enqueue 佇列滿溢
-        now = time.time()
-        elapsed = now - last_frame_time
-        if elapsed < FRAME_INTERVAL:
-            time.sleep(FRAME_INTERVAL - elapsed)
-        last_frame_time = time.time()
-
-        capture = None
-        body_frame = None
-        try:
-            capture = device.update()
-            body_frame = bodyTracker.update(capture)
-            body_id = get_closest_body(body_frame)
-
-            with skeleton_condition:
-                if body_id is not None:
-                    body = body_frame.get_body(body_id)
-                    latest_skeleton_3d = body.numpy().copy()
-                    if not last_status:
-                        print("✅ [Acquisition] 偵測到人體目標")
-                        last_status = True
-                else:
-                    latest_skeleton_3d = None
-                    if last_status:
-                        print("❓ [Acquisition] 失去人體目標")
-                        last_status = False
-                # 通知所有等待的偵測 workers 有新幀到來
-                skeleton_condition.notify_all()
-
-        except Exception as e:
-            err_msg = str(e).lower()
-            if "enqueue" in err_msg or "timeout" in err_msg:
-                # body tracker 佇列滿：略過此幀，等久一點讓 GPU 消化
-                time.sleep(0.05)
-            # 其他錯誤靜默略過
-        finally:
-            del capture
-            del body_frame
-
-
-def detect_hand_worker():
-    """【2. 舉手偵測 Worker】event-driven，有新幀才處理"""
-    global isHandUp
-    hand_states = collections.deque(maxlen=SMOOTH_WINDOW)
-
-    while True:
-        with skeleton_condition:
-            # 等待新幀（最多 200ms 避免永久阻塞）
-            skeleton_condition.wait(timeout=0.2)
-            skeleton = latest_skeleton_3d.copy() if latest_skeleton_3d is not None else None
-
-        if skeleton is None:
-            hand_states.clear()
-            continue
-
-        try:
-            # Y 軸越小越高
-            head_y = skeleton[pykinect.K4ABT_JOINT_HEAD, 1]
-            l_hand_y = skeleton[pykinect.K4ABT_JOINT_HAND_LEFT, 1]
-            r_hand_y = skeleton[pykinect.K4ABT_JOINT_HAND_RIGHT, 1]
-
-            # 任一手高於頭部即算舉手（修正：原為 AND，要求雙手同時舉起，過於嚴格）
-            hand_up_raw = (l_hand_y < head_y) or (r_hand_y < head_y)
-            hand_states.append(hand_up_raw)
-
-            # 多幀確認，避免骨架雜訊造成誤觸發
-            confirmed_up = sum(hand_states) >= SMOOTH_THRESHOLD
-
-            if confirmed_up and not isHandUp:
-                isHandUp = True
-                print("✋ [Event] 偵測到舉手")
-                socketio.emit("hand_event", {"state": "up"}, namespace='/')
-            elif not confirmed_up and isHandUp:
-                isHandUp = False
-                print("🤚 [Event] 手放下了")
-
-        except Exception:
-            pass
-
-
-def detect_kick_worker():
-    """【3. 踢腿偵測 Worker】event-driven，有新幀才處理"""
-    global isKicking
-    kick_states = collections.deque(maxlen=SMOOTH_WINDOW)
-    last_log_time = time.time()
-
-    while True:
-        with skeleton_condition:
-            skeleton_condition.wait(timeout=0.2)
-            skeleton = latest_skeleton_3d.copy() if latest_skeleton_3d is not None else None
-
-        if skeleton is None:
-            kick_states.clear()
-            continue
-
-        try:
-            # Y 軸向下為正；踢腿時腳踝上升，ankle_y 減小，dist 縮小
-            hip_y = skeleton[pykinect.K4ABT_JOINT_HIP_LEFT, 1]
-            l_ankle_y = skeleton[pykinect.K4ABT_JOINT_ANKLE_LEFT, 1]
-            r_ankle_y = skeleton[pykinect.K4ABT_JOINT_ANKLE_RIGHT, 1]
-
-            l_leg_dist = l_ankle_y - hip_y
-            r_leg_dist = r_ankle_y - hip_y
-
-            l_knee_angle = calc_knee_angle(skeleton, 'left')
-            r_knee_angle = calc_knee_angle(skeleton, 'right')
-
-            # 定時輸出 Debug Log
-            if time.time() - last_log_time > 2.0:
-                print(f"DEBUG [Kick] 左腿: dist={l_leg_dist:.0f}mm angle={l_knee_angle:.0f}° / 右腿: dist={r_leg_dist:.0f}mm angle={r_knee_angle:.0f}°")
-                last_log_time = time.time()
-
-            # 前踢判斷：腳踝高於門檻 AND 膝蓋打直（過濾高抬腿）
-            l_kick = (l_leg_dist < KICK_REL_THRESHOLD) and (l_knee_angle > KNEE_ANGLE_THRESHOLD)
-            r_kick = (r_leg_dist < KICK_REL_THRESHOLD) and (r_knee_angle > KNEE_ANGLE_THRESHOLD)
-            kick_raw = l_kick or r_kick
-            kick_states.append(kick_raw)
-
-            # 多幀確認踢腿
-            confirmed_kick = sum(kick_states) >= SMOOTH_THRESHOLD
-
-            if confirmed_kick and not isKicking:
-                isKicking = True
-                leg = "left" if l_kick else "right"
-                kicking_dist = l_leg_dist if l_kick else r_leg_dist
-                kicking_angle = l_knee_angle if l_kick else r_knee_angle
-                print(f"🦵 [Event] 偵測到前踢！({leg}) 距離: {kicking_dist:.0f}mm 膝蓋角: {kicking_angle:.0f}°")
-                socketio.emit("kick_event", {"leg": leg}, namespace='/')
-            elif not confirmed_kick and isKicking:
-                if l_leg_dist > KICK_RESET_THRESHOLD and r_leg_dist > KICK_RESET_THRESHOLD:
-                    isKicking = False
-                    print("✅ [Event] 雙腳已著地/重置")
-
-        except Exception:
-            pass
+# always_connect：先送出 CONNECT 確認再呼叫 connect handler，handler 中放進佇列的
+# server_hello / 補送事件才不會比確認早送達（client 收到前就回 event_ack 會失敗）
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', always_connect=True)
 
+# 單感測器骨架來源（與伺服器同行程）：
+#   "device[:編號]"（Azure Kinect）、"playback:檔案.mkv"（錄影）、"synthetic"（合成骨架，壓力測試 / 無硬體開發用）
+KINECT_SOURCE = os.environ.get("KINECT_SOURCE", "device")
+
+# 多感測器：設定後每個感測器各自一個 worker 行程，例如 "front=device:0,side=device:1"
+KINECT_SENSORS = os.environ.get("KINECT_SENSORS", "")
+
+# 單感測器時把偵測移到另一個行程，骨架幀經共享記憶體傳遞（"1" 開啟）
+KINECT_DETECT_PROCESS = os.environ.get("KINECT_DETECT_PROCESS", "0") == "1"
+
+# Socket.IO 對外送出：每個 client 各自一條有上限的佇列 + 送出執行緒，
+# 偵測執行緒只負責放進佇列，不會被慢的 client 卡住
+# 事件帶序號 / 擷取時間戳；client 可回 event_ack，重新連線時以 auth 帶 last_seq 補收
+emitQueueUtil.init(lambda event, data, sid, namespace: socketio.emit(event, data, to=sid, namespace=namespace))
+
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    # auth 範例：{"last_seq": 42, "boot": "18f3a..."}（首次連線不帶）
+    auth = auth if isinstance(auth, dict) else {}
+    last_seq = auth.get('last_seq')
+    try:
+        last_seq = int(last_seq) if last_seq is not None else None
+    except (ValueError, TypeError):
+        last_seq = None
+    emitQueueUtil.register_client(request.sid, last_seq=last_seq, boot=auth.get('boot'))
+
+
+@socketio.on('disconnect')
+def on_disconnect():
+    emitQueueUtil.unregister_client(request.sid)
+
+
+@socketio.on('event_ack')
+def on_event_ack(data):
+    # data 範例：{"seq": 42}
+    try:
+        emitQueueUtil.acknowledge(int(data.get('seq')))
+    except (AttributeError, ValueError, TypeError):
+        pass
+
+
+def publish_local(event, data, frame_seq, capture_ts):
+    """同行程管線的事件出口"""
+    emitQueueUtil.broadcast(event, data, frame_seq=frame_seq, capture_ts=capture_ts)
+
+
+def publish_sensor_event(sensor_id, event, data, frame_seq, capture_ts):
+    """worker 行程送回的事件出口（data 已帶 sensor 欄位）"""
+    emitQueueUtil.broadcast(event, data, frame_seq=frame_seq, capture_ts=capture_ts)
+    metricsUtil.inc(f"events_from_sensor.{sensor_id}")
+
+
+@app.route('/health')
+def health():
+    """存活檢查：行程與 HTTP 伺服器運作中即回 200（不代表感測器已就緒）"""
+    return jsonify({"status": "ok", "boot": emitQueueUtil.BOOT_ID, "uptime_sec": readinessUtil.status()["uptime_sec"]})
+
+
+@app.route('/ready')
+def ready():
+    """就緒檢查：各元件（SDK / 裝置 / 追蹤器 / 管線 / 感測器行程）狀態，全部就緒前回 503"""
+    result = readinessUtil.status()
+    return jsonify(result), 200 if result["ready"] else 503
+
+
+@app.route('/metrics')
+def metrics():
+    result = metricsUtil.snapshot()
+    if sensors is None:
+        return jsonify(result)
+    if KINECT_SENSORS:
+        result["sensors"] = sensors.sensor_status()
+    elif KINECT_DETECT_PROCESS:
+        result["detection_process"] = sensors.detection_status()
+    return jsonify(result)
+
+
+@app.route('/trace/dump', methods=['POST'])
+def trace_dump():
+    """匯出逐幀追蹤（需以 KINECT_TRACE=1 啟動）"""
+    if not traceUtil.is_enabled():
+        return jsonify({"status": "error", "msg": "tracing disabled (KINECT_TRACE=1)"}), 400
+    return jsonify({"status": "success", "path": dump_trace()})
+
+
+def dump_trace():
+    extra_events = sensors.collect_trace_events() if KINECT_SENSORS and sensors is not None else None
+    return traceUtil.dump(extra_events=extra_events)
+
+
+def startup_worker():
+    """【啟動 Worker】import 管線模組、開啟來源（失敗時定期重試）並啟動 workers，進度回報 readinessUtil"""
+    global pipeline, sensors
+    try:
+        import pipeline
+        import sensors
+        if KINECT_SENSORS:
+            # 各感測器的 sensor.<id> 元件由 start_sensors 登記
+            sensor_specs = sensors.parse_sensor_specs(KINECT_SENSORS)
+            sensors.start_sensors(sensor_specs, publish_sensor_event)
+        else:
+            readinessUtil.register(*pipeline.source_components(KINECT_SOURCE), "pipeline")
+        readinessUtil.set_ready("startup", "模組載入完成")
+    except Exception as e:
+        readinessUtil.set_failed("startup", e)
+        return
+
+    if KINECT_SENSORS:
+        print(f"- 多感測器: {len(sensor_specs)} 個 worker 行程 ({', '.join(f'{i}={s}' for i, s in sensor_specs)})")
+    elif KINECT_DETECT_PROCESS:
+        sensors.start_shm_detection(KINECT_SOURCE, publish_sensor_event)
+        readinessUtil.set_ready("pipeline")
+        print(f"- 骨架來源: {KINECT_SOURCE}（擷取同行程，偵測在另一行程，共享記憶體 ring 傳遞）")
+    else:
+        device, bodyTracker = pipeline.open_source_retrying(KINECT_SOURCE)
+        pipeline.start_pipeline(device, bodyTracker, publish_local)
+        readinessUtil.set_ready("pipeline")
+        print(f"- 骨架來源: {KINECT_SOURCE}（與伺服器同行程）")
+    print("- 執行緒 1: 資料獲取 (Condition 保護，notify_all 驅動偵測)")
+    print("- 執行緒 2: 舉手偵測 (任一手 OR 邏輯 + 5 幀滑動平滑)")
+    print("- 執行緒 3: 踢腿偵測 (5 幀滑動平滑 + 縮小滯後帶)")
+    if pipeline.ADAPTIVE_IDLE:
+        print(f"- 待機省電: {pipeline.IDLE_TIMEOUT:.0f} 秒無人後降為 {1.0 / pipeline.IDLE_FRAME_INTERVAL:.0f} fps 並停放偵測")
 
 if __name__ == "__main__":
-    workers = [
-        threading.Thread(target=kinect_data_acquisition_worker, daemon=True),
-        threading.Thread(target=detect_hand_worker, daemon=True),
-        threading.Thread(target=detect_kick_worker, daemon=True),
-    ]
+    if traceUtil.is_enabled():
+        traceUtil.set_process_name("main")
+        traceUtil.install_signal_handler(dump_trace)
+
+    # SIGTERM（服務管理員停止 / 關機）也走正常結束流程，atexit 才會通知 worker 行程結束
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-    for t in workers:
-        t.start()
+    # 伺服器先 bind，其餘元件在背景初始化（開不起來的來源每 SOURCE_RETRY_INTERVAL 秒重試）
+    readinessUtil.register("startup")
+    threading.Thread(target=startup_worker, name="startup", daemon=True).start()
 
     print("🚀 Kinect 多功能伺服器已啟動...")
-    print("- 執行緒 1: 資料獲取 (Condition 保護，notify_all 驅動偵測)")
-    print("- 執行緒 2: 舉手偵測 (任一手 OR 邏輯 + 5 幀滑動平滑)")
-    print("- 執行緒 3: 踢腿偵測 (5 幀滑動平滑 + 縮小滯後帶)")
+    print("- 分段啟動: 伺服器先 bind，SDK / 裝置 / 追蹤器於背景初始化 (GET /health、/ready)")
+    print(f"- Socket.IO 送出: 每個 client 獨立佇列 (上限 {emitQueueUtil.CLIENT_QUEUE_SIZE}) + 送出執行緒")
+    print(f"- 事件補送: 序號 + 時間戳，保留最近 {emitQueueUtil.REPLAY_BUFFER_SIZE} 筆 / {emitQueueUtil.REPLAY_MAX_AGE:.0f} 秒")
+    if traceUtil.is_enabled():
+        print(f"- 逐幀追蹤: 開啟 (POST /trace/dump 或 SIGUSR1 匯出至 {traceUtil.TRACE_DIR}/)")
 
     socketio.run(app, host="0.0.0.0", port=5000, allow_unsafe_werkzeug=True)
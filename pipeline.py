@@ -0,0 +1,649 @@
+import pykinect_azure as pykinect
+import threading
+import collections
+import multiprocessing
+import queue
+import time
+import os
+import numpy as np
+
+from utils import gestureDtwUtil, logUtil, metricsUtil, readinessUtil, shmRingUtil, traceUtil
+
+# 單一感測器的 擷取 → 偵測 管線。模組層級狀態即一條管線的狀態：
+# 單感測器時與 Socket.IO 伺服器同行程執行；多感測器時每個感測器各自一個 worker 行程
+# （見 sensors.py），各行程擁有自己的一份模組狀態，互不共享 GIL。
+
+# 攝影機優化設定
+device_config = pykinect.default_configuration
+device_config.color_resolution = pykinect.K4A_COLOR_RESOLUTION_720P
+device_config.depth_mode = pykinect.K4A_DEPTH_MODE_NFOV_2X2BINNED
+device_config.camera_fps = pykinect.K4A_FRAMES_PER_SECOND_30
+
+METRICS_REPORT_INTERVAL = 1.0  # worker 行程回報指標給主行程的間隔（秒）
+# 開啟來源失敗時重試間隔（秒）：kiosk 開機時 USB 裝置 / GPU 驅動可能比程式晚就緒
+SOURCE_RETRY_INTERVAL = float(os.environ.get("KINECT_SOURCE_RETRY", "5"))
+
+SENSOR_ID = "0"
+device = None
+bodyTracker = None
+_publish = None
+_frame_sink = None
+_sdk_initialized = False
+
+
+# 骨架數據共享（Condition 保護，解決 race condition 與 GIL 競爭）
+skeleton_condition = threading.Condition()
+latest_skeleton_3d = None
+latest_frame_seq = 0  # 每擷取一幀 +1，供追蹤與事件對應到來源幀
+latest_capture_ts = 0.0  # 該幀擷取時間（epoch 秒），事件延遲由此起算
+
+isHandUp = False
+isKicking = False
+
+# 多幀平滑設定
+SMOOTH_WINDOW = 5     # 滑動窗口幀數
+SMOOTH_THRESHOLD = 3  # 需幾幀確認才觸發
+
+FRAME_INTERVAL = 1.0 / 30  # 幀率限制，對應設定的 30fps
+
+# 待機省電：超過 IDLE_TIMEOUT 秒沒看到人，降到 IDLE_FPS 取樣並停放偵測 workers，
+# 一偵測到人體就立刻回到全速（無風扇 kiosk 夜間降低 CPU/GPU 負載與溫度）
+ADAPTIVE_IDLE = os.environ.get("KINECT_ADAPTIVE_IDLE", "1") != "0"
+IDLE_TIMEOUT = float(os.environ.get("KINECT_IDLE_TIMEOUT", "30"))
+IDLE_FRAME_INTERVAL = 1.0 / float(os.environ.get("KINECT_IDLE_FPS", "2"))
+
+# 偵測 workers 是否運作中（待機時 clear，workers 停在 wait() 不再每 200ms 喚醒）
+detectors_active = threading.Event()
+detectors_active.set()
+
+# 踢腿門檻（mm）
+KICK_REL_THRESHOLD = 650    # 觸發：腳踝與髖部垂直距離小於此值
+KICK_RESET_THRESHOLD = 700  # 重置：兩腳都須大於此值（縮小滯後帶，原為 700mm）
+KNEE_ANGLE_THRESHOLD = 160  # 膝蓋角度門檻（度），大於此值才算前踢（過濾高抬腿）
+
+# 樣板式手勢（揮手、跳、蹲…）：目錄內有樣板才啟動 DTW 偵測 worker
+# 預設以本模組所在目錄為準，以服務 / 排程啟動（工作目錄不是專案根目錄）時也找得到錄製工具存的樣板
+GESTURE_TEMPLATE_DIR = os.environ.get(
+    "KINECT_GESTURE_TEMPLATES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gesture_templates"))
+
+
+def calc_knee_angle(skeleton, side='left'):
+    if side == 'left':
+        hip   = skeleton[pykinect.K4ABT_JOINT_HIP_LEFT, :3]
+        knee  = skeleton[pykinect.K4ABT_JOINT_KNEE_LEFT, :3]
+        ankle = skeleton[pykinect.K4ABT_JOINT_ANKLE_LEFT, :3]
+    else:
+        hip   = skeleton[pykinect.K4ABT_JOINT_HIP_RIGHT, :3]
+        knee  = skeleton[pykinect.K4ABT_JOINT_KNEE_RIGHT, :3]
+        ankle = skeleton[pykinect.K4ABT_JOINT_ANKLE_RIGHT, :3]
+    v1 = hip - knee
+    v2 = ankle - knee
+    cos_a = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-6)
+    return np.degrees(np.arccos(np.clip(cos_a, -1.0, 1.0)))
+
+
+def get_closest_body(body_frame):
+    num_bodies = body_frame.get_num_bodies()
+    if num_bodies == 0:
+        return None
+    min_z = float('inf')
+    closest_id = None
+    for body_id in range(num_bodies):
+        body = body_frame.get_body(body_id)
+        skeleton_3d = body.numpy()
+        spine_z = skeleton_3d[pykinect.K4ABT_JOINT_SPINE_NAVEL, 2]
+        if spine_z < min_z:
+            min_z = spine_z
+            closest_id = body_id
+    return closest_id
+
+
+def set_idle_mode(idle):
+    """切換 全速 / 待機 模式，並更新指標"""
+    if idle:
+        detectors_active.clear()
+        logUtil.info("Acquisition", "😴 [Acquisition:{sensor}] {timeout:.0f} 秒無人，進入待機取樣",
+                     sensor=SENSOR_ID, timeout=IDLE_TIMEOUT)
+    else:
+        detectors_active.set()
+        logUtil.info("Acquisition", "⚡ [Acquisition:{sensor}] 回到全速取樣", sensor=SENSOR_ID)
+    metricsUtil.set_gauge("acquisition_mode", "idle" if idle else "active")
+    metricsUtil.inc("acquisition_mode_changes")
+
+
+def wait_for_skeleton():
+    """偵測 workers 共用：等待新幀並回傳 (骨架副本, 幀序號, 擷取時間)，無人時骨架為 None
+
+    待機模式下停放在 detectors_active，恢復時直接讀取喚醒它的那一幀，不再多等一幀。
+    """
+    with traceUtil.span("wait_frame", "detect"):
+        if not detectors_active.is_set():
+            detectors_active.wait()
+            with skeleton_condition:
+                skeleton = latest_skeleton_3d.copy() if latest_skeleton_3d is not None else None
+                return skeleton, latest_frame_seq, latest_capture_ts
+
+        with skeleton_condition:
+            # 等待新幀（最多 200ms 避免永久阻塞）
+            notified = skeleton_condition.wait(timeout=0.2)
+            skeleton = latest_skeleton_3d.copy() if latest_skeleton_3d is not None else None
+            frame_seq, capture_ts = latest_frame_seq, latest_capture_ts
+    if notified:
+        # 擷取 → 偵測 worker 拿到這一幀的延遲（每個 worker 每幀一筆）
+        metricsUtil.observe("frame_to_detect_ms", (time.time() - capture_ts) * 1000.0)
+    return skeleton, frame_seq, capture_ts
+
+
+def publish_frame(skeleton, frame_seq, capture_ts):
+    """更新共享的最新幀並通知所有等待的偵測 workers"""
+    global latest_skeleton_3d, latest_frame_seq, latest_capture_ts
+    # 分開量測取得鎖的等待時間（偵測 workers 持鎖複製骨架時的競爭）
+    with traceUtil.span("skeleton_condition.acquire", "lock"):
+        skeleton_condition.acquire()
+    try:
+        latest_skeleton_3d = skeleton
+        latest_frame_seq = frame_seq
+        latest_capture_ts = capture_ts
+        # 通知所有等待的偵測 workers 有新幀到來
+        skeleton_condition.notify_all()
+    finally:
+        skeleton_condition.release()
+
+
+def kinect_data_acquisition_worker():
+    """【1. 資料獲取 Worker】負責抓取硬體數據，並通知偵測 workers"""
+    last_status = False
+    last_frame_time = 0.0
+    last_body_time = time.time()
+    idle = False
+
+    while True:
+        # 幀率限制：確保不超過 30fps，避免 body tracker enqueue 佇列滿溢；待機時改用低取樣率
+        interval = IDLE_FRAME_INTERVAL if idle else FRAME_INTERVAL
+        now = time.time()
+        elapsed = now - last_frame_time
+        if elapsed < interval:
+            time.sleep(interval - elapsed)
+        last_frame_time = time.time()
+        frame_seq = latest_frame_seq + 1
+        frame_start = traceUtil.now_ns()
+
+        capture = None
+        body_frame = None
+        try:
+            with traceUtil.span("device.update", "acquisition"):
+                capture = device.update()
+            capture_ts = time.time()
+            with traceUtil.span("bodyTracker.update", "acquisition"):
+                body_frame = bodyTracker.update(capture)
+            body_id = get_closest_body(body_frame)
+
+            wake = False
+            if body_id is not None:
+                last_body_time = last_frame_time
+                if idle:
+                    idle = False
+                    wake = True
+            elif ADAPTIVE_IDLE and not idle and last_frame_time - last_body_time > IDLE_TIMEOUT:
+                idle = True
+                set_idle_mode(True)
+
+            skeleton = body_frame.get_body(body_id).numpy().copy() if body_id is not None else None
+
+            publish_frame(skeleton, frame_seq, capture_ts)
+            if _frame_sink is not None:
+                _frame_sink(skeleton, frame_seq, capture_ts, idle)
+            if wake:
+                # 先發布這一幀再喚醒偵測 workers，它們醒來直接讀到有人的這一幀
+                set_idle_mode(False)
+
+            if skeleton is not None and not last_status:
+                logUtil.info("Acquisition", "✅ [Acquisition:{sensor}] 偵測到人體目標", sensor=SENSOR_ID, frame=frame_seq)
+                last_status = True
+            elif skeleton is None and last_status:
+                logUtil.info("Acquisition", "❓ [Acquisition:{sensor}] 失去人體目標", sensor=SENSOR_ID, frame=frame_seq)
+                last_status = False
+
+        except Exception as e:
+            err_msg = str(e).lower()
+            if "enqueue" in err_msg or "timeout" in err_msg:
+                # body tracker 佇列滿：略過此幀，等久一點讓 GPU 消化
+                time.sleep(0.05)
+            # 其他錯誤靜默略過
+        finally:
+            del capture
+            del body_frame
+            traceUtil.complete("frame", "acquisition", frame_start, traceUtil.now_ns(), {"frame": frame_seq})
+
+
+def shm_feed_worker(ring, frame_sem):
+    """【1'. 共享記憶體讀取 Worker】偵測行程中取代擷取 worker：從 ring 取最新幀並通知偵測 workers
+
+    直接從共享記憶體的 numpy view 複製骨架（不經序列化），複製完再確認該 slot 沒被
+    繞一圈的寫入端覆寫，覆寫了就丟棄這一幀。
+    """
+    last_seq = 0
+    idle = False
+    while True:
+        if not frame_sem.acquire(timeout=0.2):
+            continue
+        # 落後時直接跳到最新幀（與同行程時「只看最新幀」的語意一致）
+        while frame_sem.acquire(False):
+            pass
+
+        seq = ring.latest_seq()
+        if seq <= last_seq:
+            continue
+        if seq - last_seq > ring.slots:
+            metricsUtil.inc("shm_overruns")
+        frame = ring.read(seq)
+        if frame is None:
+            metricsUtil.inc("shm_torn_reads")
+            continue
+        capture_ts, skeleton, ring_idle = frame
+        if skeleton is not None:
+            skeleton = skeleton.copy()
+            if not ring.is_current(seq):
+                metricsUtil.inc("shm_torn_reads")
+                continue
+        last_seq = seq
+
+        if ring_idle and not idle:
+            idle = True
+            set_idle_mode(True)
+        publish_frame(skeleton, seq, capture_ts)
+        if idle and not ring_idle:
+            idle = False
+            set_idle_mode(False)
+        metricsUtil.set_gauge("shm_frame_seq", seq)
+
+
+def detect_hand_worker():
+    """【2. 舉手偵測 Worker】event-driven，有新幀才處理"""
+    global isHandUp
+    hand_states = collections.deque(maxlen=SMOOTH_WINDOW)
+
+    while True:
+        skeleton, frame_seq, capture_ts = wait_for_skeleton()
+
+        if skeleton is None:
+            hand_states.clear()
+            continue
+
+        try:
+            detect_start = traceUtil.now_ns()
+            # Y 軸越小越高
+            head_y = skeleton[pykinect.K4ABT_JOINT_HEAD, 1]
+            l_hand_y = skeleton[pykinect.K4ABT_JOINT_HAND_LEFT, 1]
+            r_hand_y = skeleton[pykinect.K4ABT_JOINT_HAND_RIGHT, 1]
+
+            # 任一手高於頭部即算舉手（修正：原為 AND，要求雙手同時舉起，過於嚴格）
+            hand_up_raw = (l_hand_y < head_y) or (r_hand_y < head_y)
+            hand_states.append(hand_up_raw)
+
+            # 多幀確認，避免骨架雜訊造成誤觸發
+            confirmed_up = sum(hand_states) >= SMOOTH_THRESHOLD
+
+            if confirmed_up and not isHandUp:
+                isHandUp = True
+                logUtil.info("Event", "✋ [Event:{sensor}] 偵測到舉手", sensor=SENSOR_ID, frame=frame_seq)
+                publish_event("hand_event", {"state": "up"}, frame_seq, capture_ts)
+            elif not confirmed_up and isHandUp:
+                isHandUp = False
+                logUtil.info("Event", "🤚 [Event:{sensor}] 手放下了", sensor=SENSOR_ID, frame=frame_seq)
+
+            traceUtil.complete("detect_hand", "detect", detect_start, traceUtil.now_ns(), {"frame": frame_seq})
+
+        except Exception:
+            pass
+
+
+def detect_gesture_worker(library):
+    """【4. 樣板手勢偵測 Worker】event-driven，滑動視窗與樣板庫做 DTW 比對
+
+    滑動視窗以幀數對應時間：等待逾時拿到的同一幀不重複餵入；幀序號不連續（落後跳幀、
+    擷取錯誤）時清空視窗，避免把不相鄰的幀當成連續動作比對。
+    """
+    recognizer = gestureDtwUtil.GestureRecognizer(library)
+    last_seq = None
+
+    while True:
+        skeleton, frame_seq, capture_ts = wait_for_skeleton()
+        if frame_seq == last_seq:
+            continue
+        if last_seq is not None and frame_seq != last_seq + 1:
+            recognizer.reset()
+            metricsUtil.inc("gesture_window_resets")
+        last_seq = frame_seq
+
+        try:
+            with traceUtil.span("detect_gesture", "detect", {"frame": frame_seq}):
+                match = recognizer.update(skeleton)
+            if match is not None:
+                gesture, template_id, distance = match
+                logUtil.info("Event", "🙌 [Event:{sensor}] 偵測到手勢 {gesture}（樣板 {template}，距離 {distance:.3f}）",
+                             sensor=SENSOR_ID, frame=frame_seq, gesture=gesture, template=template_id,
+                             distance=distance)
+                publish_event("gesture_event", {"gesture": gesture, "template": template_id,
+                                                "distance": round(distance, 4)}, frame_seq, capture_ts)
+        except Exception:
+            pass
+
+
+def detect_kick_worker():
+    """【3. 踢腿偵測 Worker】event-driven，有新幀才處理"""
+    global isKicking
+    kick_states = collections.deque(maxlen=SMOOTH_WINDOW)
+
+    while True:
+        skeleton, frame_seq, capture_ts = wait_for_skeleton()
+
+        if skeleton is None:
+            kick_states.clear()
+            continue
+
+        try:
+            detect_start = traceUtil.now_ns()
+            # Y 軸向下為正；踢腿時腳踝上升，ankle_y 減小，dist 縮小
+            hip_y = skeleton[pykinect.K4ABT_JOINT_HIP_LEFT, 1]
+            l_ankle_y = skeleton[pykinect.K4ABT_JOINT_ANKLE_LEFT, 1]
+            r_ankle_y = skeleton[pykinect.K4ABT_JOINT_ANKLE_RIGHT, 1]
+
+            l_leg_dist = l_ankle_y - hip_y
+            r_leg_dist = r_ankle_y - hip_y
+
+            l_knee_angle = calc_knee_angle(skeleton, 'left')
+            r_knee_angle = calc_knee_angle(skeleton, 'right')
+
+            # 逐幀 Debug Log，由 logUtil 依等級取樣（預設 DEBUG 每 60 幀留 1 筆，約 2 秒）
+            logUtil.debug("Kick", "DEBUG [Kick:{sensor}] 左腿: dist={l_dist:.0f}mm angle={l_angle:.0f}° / "
+                                  "右腿: dist={r_dist:.0f}mm angle={r_angle:.0f}°",
+                          sensor=SENSOR_ID, frame=frame_seq, l_dist=float(l_leg_dist), l_angle=float(l_knee_angle),
+                          r_dist=float(r_leg_dist), r_angle=float(r_knee_angle))
+
+            # 前踢判斷：腳踝高於門檻 AND 膝蓋打直（過濾高抬腿）
+            l_kick = (l_leg_dist < KICK_REL_THRESHOLD) and (l_knee_angle > KNEE_ANGLE_THRESHOLD)
+            r_kick = (r_leg_dist < KICK_REL_THRESHOLD) and (r_knee_angle > KNEE_ANGLE_THRESHOLD)
+            kick_raw = l_kick or r_kick
+            kick_states.append(kick_raw)
+
+            # 多幀確認踢腿
+            confirmed_kick = sum(kick_states) >= SMOOTH_THRESHOLD
+
+            if confirmed_kick and not isKicking:
+                isKicking = True
+                leg = "left" if l_kick else "right"
+                kicking_dist = l_leg_dist if l_kick else r_leg_dist
+                kicking_angle = l_knee_angle if l_kick else r_knee_angle
+                logUtil.info("Event", "🦵 [Event:{sensor}] 偵測到前踢！({leg}) 距離: {dist:.0f}mm 膝蓋角: {angle:.0f}°",
+                             sensor=SENSOR_ID, frame=frame_seq, leg=leg, dist=float(kicking_dist),
+                             angle=float(kicking_angle))
+                publish_event("kick_event", {"leg": leg}, frame_seq, capture_ts)
+            elif not confirmed_kick and isKicking:
+                if l_leg_dist > KICK_RESET_THRESHOLD and r_leg_dist > KICK_RESET_THRESHOLD:
+                    isKicking = False
+                    logUtil.info("Event", "✅ [Event:{sensor}] 雙腳已著地/重置", sensor=SENSOR_ID, frame=frame_seq)
+
+            traceUtil.complete("detect_kick", "detect", detect_start, traceUtil.now_ns(), {"frame": frame_seq})
+
+        except Exception:
+            pass
+
+
+class PlaybackDevice:
+    """把 pykinect playback（.mkv 錄影）包成與 device 相同的 update() 介面，播完自動從頭重播"""
+
+    def __init__(self, path):
+        self.path = path
+        self.playback = pykinect.start_playback(path)
+
+    def get_calibration(self):
+        return self.playback.get_calibration()
+
+    def update(self):
+        ret, capture = self.playback.update()
+        if not ret:
+            self.playback.close()
+            self.playback = pykinect.start_playback(self.path)
+            ret, capture = self.playback.update()
+            if not ret:
+                raise EOFError(f"playback {self.path} 無法讀取")
+        return capture
+
+
+def _initialize_sdk():
+    global _sdk_initialized
+    if not _sdk_initialized:
+        pykinect.initialize_libraries(track_body=True)
+        _sdk_initialized = True
+
+
+def parse_source(spec):
+    """骨架來源字串 → (種類, 參數)
+
+    "device" / "device:1"          Azure Kinect（裝置編號，預設 0）
+    "playback:recording.mkv"       錄影檔（k4arecorder 格式）
+    "synthetic" / "synthetic:2.0"  合成骨架（參數為動作循環秒數）
+    """
+    kind, _, arg = spec.strip().partition(":")
+    if kind not in ("device", "playback", "synthetic"):
+        raise ValueError(f"未知的骨架來源: {spec}")
+    return kind, arg
+
+
+def source_components(spec):
+    """該來源開啟時會回報就緒狀態的元件（供 readinessUtil.register）"""
+    kind, _ = parse_source(spec)
+    return ("device",) if kind == "synthetic" else ("sdk", "device", "tracker")
+
+
+def open_source(spec):
+    """依來源字串開啟 (device, bodyTracker)；各階段結果回報 readinessUtil，失敗回傳 (None, None)"""
+    kind, arg = parse_source(spec)
+
+    if kind == "synthetic":
+        from utils import syntheticSkeletonUtil
+        presence = os.environ.get("SYNTHETIC_PRESENCE")  # 例如 "60,120"：有人 60 秒、無人 120 秒
+        motion_period = float(arg or os.environ.get("SYNTHETIC_MOTION_PERIOD", "4.0"))
+        readinessUtil.set_ready("device", spec)
+        return (syntheticSkeletonUtil.SyntheticDevice(),
+                syntheticSkeletonUtil.SyntheticBodyTracker(
+                    motion_period=motion_period,
+                    presence_cycle=tuple(float(v) for v in presence.split(",")) if presence else None))
+
+    # --- 初始化 SDK ---
+    try:
+        _initialize_sdk()
+    except (Exception, SystemExit) as e:
+        # initialize_libraries 找不到 k4a / k4abt 函式庫時會直接 sys.exit，在背景執行緒中須一併攔下
+        readinessUtil.set_failed("sdk", "找不到 Azure Kinect SDK 函式庫" if isinstance(e, SystemExit) else e)
+        return None, None
+    readinessUtil.set_ready("sdk")
+
+    # 啟動裝置
+    try:
+        if kind == "playback":
+            source = PlaybackDevice(arg)
+        else:
+            source = pykinect.start_device(device_index=int(arg or 0), config=device_config)
+    except (Exception, SystemExit) as e:
+        readinessUtil.set_failed("device", f"{spec}: {e}")
+        return None, None
+    readinessUtil.set_ready("device", spec)
+
+    # 啟動人體追蹤
+    try:
+        if kind == "playback":
+            tracker = pykinect.start_body_tracker(calibration=source.get_calibration())
+        else:
+            tracker = pykinect.start_body_tracker(pykinect.K4ABT_TRACKER_PROCESSING_MODE_GPU)
+    except (Exception, SystemExit) as e:
+        readinessUtil.set_failed("tracker", e)
+        return None, None
+    readinessUtil.set_ready("tracker")
+    return source, tracker
+
+
+def open_source_retrying(spec, on_failure=None, keep_trying=None):
+    """開啟來源直到成功，每 SOURCE_RETRY_INTERVAL 秒重試一次
+
+    on_failure(error)：每次失敗時呼叫，error 為失敗元件與原因（例如 "device: device:0: ..."）
+    keep_trying()：回傳 False 時停止重試並回傳 (None, None)
+    """
+    while True:
+        source_device, source_tracker = open_source(spec)
+        if source_device is not None:
+            return source_device, source_tracker
+        if keep_trying is not None and not keep_trying():
+            return None, None
+        if on_failure is not None:
+            components = readinessUtil.status()["components"]
+            on_failure("; ".join(f"{name}: {c['detail']}" for name, c in components.items()
+                                 if c["state"] == readinessUtil.FAILED))
+        time.sleep(SOURCE_RETRY_INTERVAL)
+
+
+def publish_event(event, data, frame_seq, capture_ts):
+    """偵測 workers 送出事件：加上感測器 ID 後交給 start_pipeline 設定的 publish"""
+    payload = dict(data)
+    payload["sensor"] = SENSOR_ID
+    _publish(event, payload, frame_seq, capture_ts)
+
+
+def detector_threads(sensor_id):
+    """偵測 workers（舉手、踢腿，以及有樣板時的 DTW 手勢）"""
+    workers = [
+        threading.Thread(target=detect_hand_worker, name=f"detect_hand-{sensor_id}", daemon=True),
+        threading.Thread(target=detect_kick_worker, name=f"detect_kick-{sensor_id}", daemon=True),
+    ]
+    start = time.perf_counter()
+    try:
+        library = gestureDtwUtil.load_library(GESTURE_TEMPLATE_DIR)
+    except Exception as e:
+        logUtil.error("Gesture", "❌ [Gesture:{sensor}] 樣板載入失敗: {error}", sensor=sensor_id, error=str(e))
+        library = None
+    if library is None:
+        return workers
+    if not len(library):
+        logUtil.info("Gesture", "ℹ️ [Gesture:{sensor}] {dir} 中沒有樣板，不啟動手勢偵測",
+                     sensor=sensor_id, dir=os.path.abspath(GESTURE_TEMPLATE_DIR))
+    else:
+        metricsUtil.set_gauge("gesture_templates", len(library))
+        metricsUtil.set_gauge("gesture_library_load_ms", round((time.perf_counter() - start) * 1000.0, 1))
+        logUtil.info("Gesture", "🙌 [Gesture:{sensor}] 載入 {count} 個手勢樣板（{dir}）",
+                     sensor=sensor_id, count=len(library), dir=os.path.abspath(GESTURE_TEMPLATE_DIR))
+        workers.append(threading.Thread(target=detect_gesture_worker, args=(library,),
+                                        name=f"detect_gesture-{sensor_id}", daemon=True))
+    return workers
+
+
+def start_pipeline(source_device, source_tracker, publish, sensor_id="0", frame_sink=None):
+    """啟動 擷取 + 偵測 workers，回傳執行緒清單
+
+    publish(event, data, frame_seq, capture_ts)：事件出口（同行程直接廣播，worker 行程則送回主行程）
+    frame_sink(skeleton, frame_seq, capture_ts, idle)：設定時每幀另外寫出（shm 模式），
+        偵測改在另一個行程執行，本行程只啟動擷取
+    """
+    global device, bodyTracker, _publish, _frame_sink, SENSOR_ID
+    device = source_device
+    bodyTracker = source_tracker
+    _publish = publish
+    _frame_sink = frame_sink
+    SENSOR_ID = sensor_id
+    metricsUtil.set_gauge("acquisition_mode", "active")
+
+    workers = [
+        threading.Thread(target=kinect_data_acquisition_worker, name=f"acquisition-{sensor_id}", daemon=True),
+    ]
+    if frame_sink is None:
+        workers += detector_threads(sensor_id)
+    for t in workers:
+        t.start()
+    return workers
+
+
+def run_sensor_process(sensor_id, spec, event_queue, control_queue):
+    """【感測器 worker 行程進入點】開啟來源、跑管線，事件與指標經 event_queue 回主行程
+
+    event_queue 訊息：
+        ("ready", sensor_id, detail) / ("failed", sensor_id, error)
+        ("event", sensor_id, event, data, frame_seq, capture_ts)
+        ("metrics", sensor_id, snapshot)
+        ("trace", sensor_id, trace_events)
+    control_queue 指令："trace_dump" / "stop"
+
+    主行程被強制結束（kill -9、Windows 的 TerminateProcess）時不會送 "stop"，atexit 也不會執行；
+    控制迴圈每次逾時都確認主行程還在，不在就結束，避免孤兒行程一直佔用 Kinect。
+    """
+    parent = multiprocessing.parent_process()
+
+    def parent_alive():
+        return parent is None or parent.is_alive()
+
+    traceUtil.set_process_name(f"sensor-{sensor_id}")
+    logUtil.set_process_name(f"sensor-{sensor_id}")
+    metricsUtil.set_gauge("source", spec)
+
+    def publish(event, data, frame_seq, capture_ts):
+        event_queue.put(("event", sensor_id, event, data, frame_seq, capture_ts))
+
+    source_device, source_tracker = open_source_retrying(
+        spec, on_failure=lambda error: event_queue.put(("failed", sensor_id, error)), keep_trying=parent_alive)
+    if source_device is None:
+        event_queue.cancel_join_thread()
+        return
+    start_pipeline(source_device, source_tracker, publish, sensor_id)
+    event_queue.put(("ready", sensor_id, spec))
+
+    while True:
+        try:
+            command = control_queue.get(timeout=METRICS_REPORT_INTERVAL)
+        except queue.Empty:
+            command = None
+        if command == "stop":
+            return
+        if not parent_alive():
+            logUtil.warning("Sensors", "⚠️ [Sensors:{sensor}] 主行程已結束，關閉感測器行程", sensor=sensor_id)
+            # 沒有人讀 event_queue 了，結束時不等佇列送完
+            event_queue.cancel_join_thread()
+            return
+        if command == "trace_dump":
+            event_queue.put(("trace", sensor_id, traceUtil.snapshot_events()))
+        event_queue.put(("metrics", sensor_id, metricsUtil.snapshot()))
+
+
+def run_detection_process(ring_name, frame_sem, conn, sensor_id="0"):
+    """【偵測行程進入點】從共享記憶體 ring 讀骨架幀，事件經 conn（單向 Pipe）送回擷取端
+
+    conn 訊息：("ready",) / ("event", event, data, frame_seq, capture_ts) / ("metrics", snapshot)
+    """
+    global _publish, SENSOR_ID
+    traceUtil.set_process_name(f"detect-{sensor_id}")
+    logUtil.set_process_name(f"detect-{sensor_id}")
+    ring = shmRingUtil.SkeletonRing.attach(ring_name)
+    send_lock = threading.Lock()
+
+    def send(message):
+        # Connection 非執行緒安全，兩個偵測 workers 共用時需加鎖
+        with send_lock:
+            conn.send(message)
+
+    def publish(event, data, frame_seq, capture_ts):
+        send(("event", event, data, frame_seq, capture_ts))
+
+    _publish = publish
+    SENSOR_ID = sensor_id
+    workers = [
+        threading.Thread(target=shm_feed_worker, args=(ring, frame_sem), name=f"shm_feed-{sensor_id}", daemon=True),
+    ] + detector_threads(sensor_id)
+    for t in workers:
+        t.start()
+    send(("ready",))
+
+    while True:
+        time.sleep(METRICS_REPORT_INTERVAL)
+        try:
+            send(("metrics", metricsUtil.snapshot()))
+        except (BrokenPipeError, EOFError, OSError):
+            # 擷取端已結束
+            return
@@ -0,0 +1,270 @@
+import atexit
+import multiprocessing
+import threading
+import time
+
+import pipeline
+from utils import logUtil, readinessUtil, shmRingUtil
+
+# 多感測器：每個感測器一個 worker 行程（pipeline.run_sensor_process），
+# 事件經共用的 multiprocessing.Queue 回到主行程，由 on_event 併入 Socket.IO 廣播。
+# 使用 spawn 以確保 Windows / Linux 行為一致（不 fork 帶有執行緒的行程）
+
+RESTART_BACKOFF = 2.0  # worker 行程異常結束後，重啟前等待秒數
+
+_ctx = multiprocessing.get_context("spawn")
+_event_queue = None
+_sensors = {}          # sensor_id -> dict(spec, process, control, restarts, started, metrics)
+_sensors_lock = threading.Lock()
+_trace_replies = {}
+_trace_cond = threading.Condition()
+_on_event = None
+_stopping = False
+_detection = {}        # shm 模式：ring / frame_sem / process / restarts / metrics
+
+
+def parse_sensor_specs(text):
+    """KINECT_SENSORS 字串 → [(sensor_id, spec)]
+
+    例："front=device:0,side=device:1,demo=synthetic"；省略 "id=" 時以順序編號
+    """
+    specs = []
+    for i, item in enumerate(t for t in text.split(",") if t.strip()):
+        sensor_id, sep, spec = item.strip().partition("=")
+        if not sep:
+            sensor_id, spec = str(i), sensor_id
+        pipeline.parse_source(spec)  # 提早檢查格式
+        specs.append((sensor_id.strip(), spec.strip()))
+    ids = [s[0] for s in specs]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"感測器 ID 重複: {ids}")
+    return specs
+
+
+def start_sensors(specs, on_event):
+    """啟動所有感測器 worker 行程與主行程的接收 / 監看執行緒
+
+    on_event(sensor_id, event, data, frame_seq, capture_ts) 在接收執行緒中呼叫
+    """
+    global _event_queue, _on_event
+    _on_event = on_event
+    _event_queue = _ctx.Queue()
+    readinessUtil.register(*(f"sensor.{sensor_id}" for sensor_id, _ in specs))
+    for sensor_id, spec in specs:
+        with _sensors_lock:
+            _sensors[sensor_id] = {"spec": spec, "process": None, "control": None,
+                                   "restarts": 0, "started": 0.0, "metrics": None}
+        _spawn(sensor_id)
+    threading.Thread(target=_receiver_worker, name="sensor-receiver", daemon=True).start()
+    threading.Thread(target=_supervisor_worker, name="sensor-supervisor", daemon=True).start()
+    atexit.register(stop_sensors)
+
+
+def stop_sensors(timeout=3.0):
+    """通知各 worker 行程結束（主行程結束時經 atexit 呼叫），逾時未結束的強制終止"""
+    global _stopping
+    _stopping = True
+    with _sensors_lock:
+        entries = list(_sensors.values())
+    for entry in entries:
+        try:
+            entry["control"].put("stop")
+        except Exception:
+            pass
+    for entry in entries:
+        entry["process"].join(timeout)
+        if entry["process"].is_alive():
+            entry["process"].terminate()
+
+
+def sensor_status():
+    """各感測器行程狀態與最近一次回報的指標，供 /metrics 使用"""
+    with _sensors_lock:
+        return {
+            sensor_id: {
+                "spec": entry["spec"],
+                "pid": entry["process"].pid if entry["process"] is not None else None,
+                "alive": entry["process"] is not None and entry["process"].is_alive(),
+                "restarts": entry["restarts"],
+                "metrics": entry["metrics"],
+            }
+            for sensor_id, entry in _sensors.items()
+        }
+
+
+def collect_trace_events(timeout=2.0):
+    """要求所有 worker 行程回傳追蹤緩衝區，合併後回傳（逾時的行程略過）"""
+    with _sensors_lock:
+        controls = {sensor_id: entry["control"] for sensor_id, entry in _sensors.items()}
+    with _trace_cond:
+        _trace_replies.clear()
+    for control in controls.values():
+        control.put("trace_dump")
+
+    deadline = time.time() + timeout
+    with _trace_cond:
+        while len(_trace_replies) < len(controls):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            _trace_cond.wait(remaining)
+        events = []
+        for reply in _trace_replies.values():
+            events.extend(reply)
+        return events
+
+
+def _spawn(sensor_id):
+    with _sensors_lock:
+        entry = _sensors[sensor_id]
+        control = _ctx.Queue()
+        process = _ctx.Process(target=pipeline.run_sensor_process,
+                               args=(sensor_id, entry["spec"], _event_queue, control),
+                               name=f"sensor-{sensor_id}", daemon=True)
+        entry["control"] = control
+        entry["process"] = process
+        entry["started"] = time.time()
+    process.start()
+    logUtil.info("Sensors", "🎥 [Sensors] 啟動感測器 {sensor} ({spec}) pid={pid}",
+                 sensor=sensor_id, spec=entry["spec"], pid=process.pid)
+
+
+def _receiver_worker():
+    """【接收 Worker】把 worker 行程送回的事件 / 指標 / 追蹤分派到主行程"""
+    while True:
+        try:
+            message = _event_queue.get()
+        except (EOFError, OSError):
+            return
+        kind, sensor_id = message[0], message[1]
+        if kind == "event":
+            _, _, event, data, frame_seq, capture_ts = message
+            try:
+                _on_event(sensor_id, event, data, frame_seq, capture_ts)
+            except Exception as e:
+                logUtil.warning("Sensors", "⚠️ [Sensors] 事件轉送失敗 ({sensor}): {error}", sensor=sensor_id, error=str(e))
+        elif kind == "ready":
+            readinessUtil.set_ready(f"sensor.{sensor_id}", message[2])
+        elif kind == "failed":
+            readinessUtil.set_failed(f"sensor.{sensor_id}", message[2])
+        elif kind == "metrics":
+            with _sensors_lock:
+                if sensor_id in _sensors:
+                    _sensors[sensor_id]["metrics"] = message[2]
+        elif kind == "trace":
+            with _trace_cond:
+                _trace_replies[sensor_id] = message[2]
+                _trace_cond.notify_all()
+
+
+def _supervisor_worker():
+    """【監看 Worker】worker 行程意外結束時自動重啟（kiosk 無人值守）"""
+    while not _stopping:
+        time.sleep(1.0)
+        with _sensors_lock:
+            dead = [sensor_id for sensor_id, entry in _sensors.items()
+                    if not entry["process"].is_alive() and time.time() - entry["started"] > RESTART_BACKOFF]
+        for sensor_id in dead:
+            if _stopping:
+                return
+            with _sensors_lock:
+                entry = _sensors[sensor_id]
+                entry["restarts"] += 1
+                exitcode = entry["process"].exitcode
+            logUtil.error("Sensors", "❌ [Sensors] 感測器 {sensor} 行程結束 (exit={exitcode})，重新啟動",
+                          sensor=sensor_id, exitcode=exitcode)
+            readinessUtil.set_pending(f"sensor.{sensor_id}", f"重新啟動中 (exit={exitcode})")
+            _spawn(sensor_id)
+
+
+def start_shm_detection(spec, on_event, sensor_id="0"):
+    """shm 模式：本行程只跑擷取，骨架幀寫入共享記憶體 ring，偵測在另一個行程（避開與伺服器搶 GIL）
+
+    on_event(sensor_id, event, data, frame_seq, capture_ts) 在接收執行緒中呼叫；
+    來源開不起來時會持續重試，呼叫端應在背景執行緒呼叫
+    """
+    readinessUtil.register("detector")
+    ring = shmRingUtil.SkeletonRing.create()
+    frame_sem = _ctx.Semaphore(0)
+    _detection.update({"ring": ring, "frame_sem": frame_sem, "sensor_id": sensor_id,
+                       "process": None, "restarts": 0, "metrics": None})
+    conn = _spawn_detection()
+
+    def frame_sink(skeleton, frame_seq, capture_ts, idle):
+        if _stopping:
+            return
+        ring.write(skeleton, frame_seq, capture_ts, idle)
+        frame_sem.release()
+
+    threading.Thread(target=_detection_receiver_worker, args=(conn, on_event),
+                     name="detect-receiver", daemon=True).start()
+    atexit.register(stop_shm_detection)
+    source_device, source_tracker = pipeline.open_source_retrying(spec)
+    pipeline.start_pipeline(source_device, source_tracker, None, sensor_id, frame_sink=frame_sink)
+
+
+def stop_shm_detection(timeout=3.0):
+    """結束偵測行程並關閉 / unlink 共享記憶體 ring（主行程結束時經 atexit 呼叫）"""
+    global _stopping
+    _stopping = True
+    process = _detection.get("process")
+    if process is not None and process.is_alive():
+        process.terminate()
+        process.join(timeout)
+    ring = _detection.pop("ring", None)
+    if ring is not None:
+        ring.close()
+
+
+def detection_status():
+    """shm 模式偵測行程狀態，供 /metrics 使用"""
+    process = _detection.get("process")
+    return {
+        "pid": process.pid if process is not None else None,
+        "alive": process is not None and process.is_alive(),
+        "restarts": _detection.get("restarts", 0),
+        "shm_name": _detection["ring"].name if "ring" in _detection else None,
+        "metrics": _detection.get("metrics"),
+    }
+
+
+def _spawn_detection():
+    recv_conn, send_conn = _ctx.Pipe(duplex=False)
+    process = _ctx.Process(target=pipeline.run_detection_process,
+                           args=(_detection["ring"].name, _detection["frame_sem"], send_conn, _detection["sensor_id"]),
+                           name=f"detect-{_detection['sensor_id']}", daemon=True)
+    process.start()
+    # 子行程已持有寫入端；父行程關閉自己的副本，子行程結束時 recv 才會收到 EOF
+    send_conn.close()
+    _detection["process"] = process
+    logUtil.info("Sensors", "🧠 [Sensors] 偵測行程啟動 pid={pid} (shm={shm})", pid=process.pid, shm=_detection["ring"].name)
+    return recv_conn
+
+
+def _detection_receiver_worker(conn, on_event):
+    """【接收 Worker】接收偵測行程送回的事件與指標；偵測行程結束時重新啟動"""
+    sensor_id = _detection["sensor_id"]
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            if _stopping:
+                return
+            _detection["process"].join(1.0)
+            logUtil.error("Sensors", "❌ [Sensors] 偵測行程結束 (exit={exitcode})，重新啟動",
+                          exitcode=_detection["process"].exitcode)
+            readinessUtil.set_pending("detector", "重新啟動中")
+            _detection["restarts"] += 1
+            time.sleep(RESTART_BACKOFF)
+            conn = _spawn_detection()
+            continue
+        if message[0] == "ready":
+            readinessUtil.set_ready("detector", f"pid={_detection['process'].pid}")
+        elif message[0] == "event":
+            _, event, data, frame_seq, capture_ts = message
+            try:
+                on_event(sensor_id, event, data, frame_seq, capture_ts)
+            except Exception as e:
+                logUtil.warning("Sensors", "⚠️ [Sensors] 事件轉送失敗 ({sensor}): {error}", sensor=sensor_id, error=str(e))
+        elif message[0] == "metrics":
+            _detection["metrics"] = message[1]
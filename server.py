@@ -1,9 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from escpos.printer import Usb
 from PIL import Image, ImageDraw, ImageFont
+import atexit
 import datetime
 import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils import logUtil, metricsUtil, printQueueUtil, readinessUtil, traceUtil
 
 # --- 自動修正驅動問題 (避免 No backend available) ---
 import usb.core
@@ -22,14 +28,56 @@ except:
 app = Flask(__name__)
 CORS(app)
 
+
+# --- 請求追蹤（KINECT_TRACE=1 時記錄每個 request 的 span）---
+@app.before_request
+def trace_request_start():
+    if traceUtil.is_enabled():
+        g.trace_start = traceUtil.now_ns()
+
+
+@app.teardown_request
+def trace_request_end(exc=None):
+    start = g.pop('trace_start', None)
+    if start is not None:
+        traceUtil.complete(f"{request.method} {request.path}", "http", start, traceUtil.now_ns(),
+                           {"error": str(exc)} if exc is not None else None)
+
 # --- 設定參數 ---
 VID = 0x1fc9
 PID = 0x2016
 EP_OUT = 0x03
 EP_IN = 0x81
 
+PRINTER_RETRY_INTERVAL = 5.0  # 秒；開機時印表機未接上 / 未通電，背景持續重試
+
+# --- 列印佇列 ---
+# 請求先寫入持久化佇列（utils/printQueueUtil，SQLite WAL）再回應，行程當掉 / 重開機不遺失。
+# 可開多個 server.py 行程接受請求（PRINT_SERVER_PORT 不同），PRINT_QUEUE_OWNER=1 的行程競爭資料庫中的
+# 擁有者租約，同時只有一個負責認領與列印，其餘待命（擁有者當掉、租約逾時後接手），例如：
+#   python server.py                                            # 4000：接受請求 + 列印
+#   PRINT_QUEUE_OWNER=0 PRINT_SERVER_PORT=4001 python server.py  # 4001：只接受請求
+PRINT_SERVER_PORT = int(os.environ.get("PRINT_SERVER_PORT", "4000"))
+PRINT_QUEUE_OWNER = os.environ.get("PRINT_QUEUE_OWNER", "1") == "1"
+PRINT_OWNER_ID = os.environ.get("PRINT_OWNER_ID", "printer")  # 記錄 / 租約中顯示的名稱
+# 認領與租約以每個行程唯一的 token 識別，同名的兩個行程也不會互相回收或完成對方的工作
+PRINT_OWNER_TOKEN = f"{PRINT_OWNER_ID}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+PRINT_BATCH_SIZE = 8
+PRINT_POLL_INTERVAL = 0.2  # 秒；其他行程寫入的工作靠輪詢發現
+PRINT_LEASE_RENEW = printQueueUtil.LEASE_TTL / 3  # 秒；續約間隔，待命行程也以此間隔嘗試接手
+PRINT_OWNER_MAX_FAILURES = 5    # 連續失敗幾次後 /ready 回報 print_owner 失敗
+PRINT_OWNER_BACKOFF_MAX = 5.0   # 秒；資料庫錯誤後的最長退避
+PRINT_MARK_RETRIES = 3          # 寫入列印結果遇到資料庫鎖定時的重試次數
+PRINT_ABORTED = "工作已不屬於此擁有者，未送出"
+
+FONT_PATH = "C:\\Windows\\Fonts\\msjh.ttc"
+FONT_SIZES = {'title': 36, 'header': 28, 'body': 22, 'bold': 24, 'small': 19, 'big_money': 42}
+
 # --- 全域變數 ---
 printer_device = None
+printer_lock = threading.Lock()  # 背景連線與列印請求可能同時呼叫 get_printer
+fonts = None
+job_wakeup = threading.Event()  # 同行程寫入新工作時立即喚醒列印擁有者
 
 # --- 等級對應資料 ---
 GRADE_INFO = {
@@ -70,24 +118,172 @@ def get_grade(watched_percent):
 def get_printer():
     """ 取得或重新建立印表機連線 """
     global printer_device
-    if printer_device is not None:
-        return printer_device
+    with printer_lock:
+        if printer_device is not None:
+            return printer_device
+
+        try:
+            # escpos 連帶載入 qrcode / barcode 等，import 約 0.3 秒，延到第一次連線（背景執行緒）才載入
+            from escpos.printer import Usb
+            logUtil.info("Printer", "嘗試建立 USB 連線...")
+            # 加入 profile="TM-T88II" 消除寬度警告
+            p = Usb(idVendor=VID, idProduct=PID, timeout=0, in_ep=EP_IN, out_ep=EP_OUT, profile="TM-T88II")
+            printer_device = p
+            logUtil.info("Printer", "連線成功！準備就緒。")
+            readinessUtil.set_ready("printer", f"{VID:04x}:{PID:04x}")
+            return printer_device
+        except Exception as e:
+            logUtil.error("Printer", "連線失敗: {error}", error=str(e))
+            readinessUtil.set_failed("printer", e)
+            return None
+
+def load_fonts():
+    """ 載入列印用字型（只載入一次），失敗回傳 None """
+    global fonts
+    if fonts is not None:
+        return fonts
 
     try:
-        print("嘗試建立 USB 連線...")
-        # 加入 profile="TM-T88II" 消除寬度警告
-        p = Usb(idVendor=VID, idProduct=PID, timeout=0, in_ep=EP_IN, out_ep=EP_OUT, profile="TM-T88II")
-        printer_device = p
-        print("連線成功！準備就緒。")
-        return printer_device
+        fonts = {name: ImageFont.truetype(FONT_PATH, size) for name, size in FONT_SIZES.items()}
+        readinessUtil.set_ready("fonts", FONT_PATH)
+        return fonts
     except Exception as e:
-        print(f"連線失敗: {e}")
+        logUtil.error("Printer", "字體載入失敗，請確認 Windows 字型資料夾", path=FONT_PATH, error=str(e))
+        readinessUtil.set_failed("fonts", e)
         return None
 
-def execute_print_job(watch_seconds=10, watched_percent=50):
+def startup_worker():
+    """【啟動 Worker】伺服器 bind 後在背景開啟列印佇列；擁有者另外載入字型、連線印表機並開始列印"""
+    try:
+        printQueueUtil.init()
+        readinessUtil.set_ready("print_queue", printQueueUtil.PRINT_QUEUE_DB)
+    except Exception as e:
+        readinessUtil.set_failed("print_queue", e)
+        return
+
+    if not PRINT_QUEUE_OWNER:
+        return
+    load_fonts()
+    threading.Thread(target=print_owner_worker, name="print-owner", daemon=True).start()
+    while get_printer() is None:
+        time.sleep(PRINTER_RETRY_INTERVAL)
+
+def _record_result(mark, *args, **kwargs):
+    """寫入列印結果；資料庫暫時鎖住時重試，避免已出紙的工作停在 printing、重啟後被標為失敗"""
+    for attempt in range(PRINT_MARK_RETRIES):
+        try:
+            return mark(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if attempt == PRINT_MARK_RETRIES - 1:
+                raise
+            logUtil.warning("PrintQueue", "寫入列印結果失敗，重試中: {error}", error=str(e))
+            time.sleep(PRINT_POLL_INTERVAL * (attempt + 1))
+
+def run_queued_job(job):
+    """ 列印一筆已認領的工作並標記結果 """
+    payload = job['payload']
+    started = []
+
+    def on_start():
+        # 工作已不屬於此擁有者（租約逾時被接手）時不送出，避免同一張印兩次
+        try:
+            ok = printQueueUtil.mark_printing(job['id'], PRINT_OWNER_TOKEN)
+        except sqlite3.OperationalError as e:
+            logUtil.error("PrintQueue", "工作 #{job_id} 無法標記為列印中: {error}", job_id=job['id'], error=str(e))
+            return False
+        if ok:
+            started.append(True)
+        return ok
+
+    success, info = execute_print_job(payload.get('watchSeconds', 0), payload.get('watchedPercent', 0), on_start)
+    if success:
+        _record_result(printQueueUtil.mark_done, job['id'], PRINT_OWNER_TOKEN)
+    elif started:
+        _record_result(printQueueUtil.mark_failed, job['id'], PRINT_OWNER_TOKEN, info)
+    elif info == PRINT_ABORTED:
+        # 還沒送出：仍屬於自己的話放回佇列（已被接手的話 release 不會有作用）
+        printQueueUtil.release(job['id'], PRINT_OWNER_TOKEN)
+        logUtil.warning("PrintQueue", "工作 #{job_id} 未送出: {info}", job_id=job['id'], info=info)
+        return
+    else:
+        _record_result(printQueueUtil.mark_failed, job['id'], PRINT_OWNER_TOKEN, info,
+                       from_state=printQueueUtil.CLAIMED)
+    logUtil.info("PrintQueue", "工作 #{job_id} {result}: {info}", job_id=job['id'],
+                 result="完成" if success else "失敗", info=info)
+
+def acquire_owner_lease(holding):
+    """取得 / 續約擁有者租約，回傳是否持有；剛取得時回收先前擁有者留下的工作"""
+    acquired, holder = printQueueUtil.acquire_lease(PRINT_OWNER_TOKEN)
+    if not acquired:
+        if holding:
+            logUtil.warning("PrintQueue", "擁有者租約已由 {holder} 取得，停止列印", holder=holder)
+        readinessUtil.set_ready("print_owner", f"待命（租約由 {holder} 持有）")
+        return False
+    if not holding:
+        requeued, interrupted = printQueueUtil.recover(PRINT_OWNER_TOKEN)
+        logUtil.info("PrintQueue", "🖨️ 取得列印擁有者租約 ({owner})", owner=PRINT_OWNER_TOKEN)
+        if requeued or interrupted:
+            logUtil.warning("PrintQueue", "重啟回收: {requeued} 筆放回佇列，{interrupted} 筆列印中斷標為失敗",
+                            requeued=requeued, interrupted=interrupted)
+        readinessUtil.set_ready("print_owner", PRINT_OWNER_TOKEN)
+    return True
+
+def print_owner_worker():
+    """【列印擁有者 Worker】持有擁有者租約時從持久化佇列分批認領工作、依序列印
+
+    租約由其他存活的行程持有時待命。資料庫錯誤（例如多個行程寫入時 database is locked）
+    記錄後退避重試（重新續約並回收未完成的工作），連續失敗時 /ready 回報 print_owner 失敗。
+    """
+    atexit.register(printQueueUtil.release_lease, PRINT_OWNER_TOKEN)
+    holding = False
+    last_renew = 0.0
+    failures = 0
+
+    while True:
+        try:
+            if time.time() - last_renew >= PRINT_LEASE_RENEW:
+                holding = acquire_owner_lease(holding)
+                last_renew = time.time()
+            if not holding:
+                failures = 0
+                time.sleep(PRINT_LEASE_RENEW)
+                continue
+
+            job_wakeup.clear()
+            jobs = printQueueUtil.claim_batch(PRINT_OWNER_TOKEN, PRINT_BATCH_SIZE)
+            if failures:
+                failures = 0
+                readinessUtil.set_ready("print_owner", PRINT_OWNER_TOKEN)
+            if not jobs:
+                job_wakeup.wait(PRINT_POLL_INTERVAL)
+                continue
+            for i, job in enumerate(jobs):
+                printer_missing = get_printer() is None
+                if printer_missing or time.time() - last_renew >= PRINT_LEASE_RENEW:
+                    # 印表機未連線 / 租約該續約了：還沒送出的工作放回佇列，下一輪再認領
+                    for pending in jobs[i:]:
+                        printQueueUtil.release(pending['id'], PRINT_OWNER_TOKEN)
+                    if printer_missing:
+                        time.sleep(PRINTER_RETRY_INTERVAL)
+                    break
+                run_queued_job(job)
+        except Exception as e:
+            failures += 1
+            logUtil.error("PrintQueue", "列印擁有者迴圈錯誤（第 {failures} 次）: {error}",
+                          failures=failures, error=str(e))
+            if failures >= PRINT_OWNER_MAX_FAILURES:
+                readinessUtil.set_failed("print_owner", e)
+            # 重新取得租約並回收：中途失敗而停在 claimed / printing 的工作不會卡住
+            holding = False
+            last_renew = 0.0
+            time.sleep(min(PRINT_OWNER_BACKOFF_MAX, PRINT_POLL_INTERVAL * 2 ** failures))
+
+def execute_print_job(watch_seconds=10, watched_percent=50, on_start=None):
+    """ 繪製並列印薪資單；on_start 在開始送資料到印表機前呼叫（之後失敗可能已出紙） """
     global printer_device
 
-    p = get_printer()
+    with traceUtil.span("get_printer", "print"):
+        p = get_printer()
     if p is None:
         return False, "無法連接印表機"
 
@@ -100,17 +296,15 @@ def execute_print_job(watch_seconds=10, watched_percent=50):
         image = Image.new('RGB', (WIDTH, HEIGHT), (255, 255, 255))
         draw = ImageDraw.Draw(image)
 
-        try:
-            path_msjh = "C:\\Windows\\Fonts\\msjh.ttc"
-            font_title = ImageFont.truetype(path_msjh, 36)
-            font_header = ImageFont.truetype(path_msjh, 28)
-            font_body = ImageFont.truetype(path_msjh, 22)
-            font_bold = ImageFont.truetype(path_msjh, 24)
-            font_small = ImageFont.truetype(path_msjh, 19)
-            font_big_money = ImageFont.truetype(path_msjh, 42)
-        except:
-            print("字體載入失敗，請確認 Windows 字型資料夾")
+        loaded = load_fonts()
+        if loaded is None:
             return False, "字體錯誤"
+        font_title = loaded['title']
+        font_header = loaded['header']
+        font_body = loaded['body']
+        font_bold = loaded['bold']
+        font_small = loaded['small']
+        font_big_money = loaded['big_money']
 
         def draw_line(y_pos, style="="):
             char = "=" if style == "=" else "-"
@@ -268,19 +462,24 @@ def execute_print_job(watch_seconds=10, watched_percent=50):
         final_image = image.crop((0, 0, WIDTH, y))
         final_image.save("last_print_preview.png")
 
-        print(f"正在列印: 等級{grade} / {grade_name} / {watch_seconds}s / {watched_percent}%")
-        p.image(final_image)
-        p.cut()
+        logUtil.info("Printer", "正在列印: 等級{grade} / {grade_name} / {watch_seconds}s / {watched_percent}%",
+                     grade=grade, grade_name=grade_name, watch_seconds=watch_seconds, watched_percent=watched_percent)
+        if on_start is not None and not on_start():
+            return False, PRINT_ABORTED
+        with traceUtil.span("printer.image", "print"):
+            p.image(final_image)
+            p.cut()
 
         return True, "列印成功"
 
     except Exception as e:
-        print(f"列印中斷: {e}")
+        logUtil.error("Printer", "列印中斷: {error}", error=str(e))
         try:
             p.close()
         except:
             pass
         printer_device = None
+        readinessUtil.set_failed("printer", e)
         return False, f"列印失敗: {str(e)}"
 
 @app.route('/api/print', methods=['POST'])
@@ -297,20 +496,69 @@ def handle_print():
         watch_seconds = 0
         watched_percent = 0
 
-    success, info = execute_print_job(watch_seconds, watched_percent)
-
-    if success:
-        return jsonify({"status": "success", "msg": "已加入佇列"})
-    else:
-        return jsonify({"status": "error", "msg": info}), 500
+    # 前端重送同一張單時帶相同的 Idempotency-Key（header 或 idempotencyKey 欄位），只會印一次
+    idem_key = request.headers.get('Idempotency-Key') or data.get('idempotencyKey') or uuid.uuid4().hex
+    try:
+        job_id, created = printQueueUtil.enqueue(
+            {'watchSeconds': watch_seconds, 'watchedPercent': watched_percent}, str(idem_key))
+    except Exception as e:
+        logUtil.error("PrintQueue", "寫入列印佇列失敗: {error}", error=str(e))
+        return jsonify({"status": "error", "msg": f"列印佇列錯誤: {e}"}), 503
+    job_wakeup.set()
+
+    return jsonify({"status": "success", "msg": "已加入佇列", "jobId": job_id, "duplicate": not created})
+
+@app.route('/api/print/<int:job_id>')
+def print_job_status(job_id):
+    """查詢列印工作狀態（queued / claimed / printing / done / failed）"""
+    job = printQueueUtil.get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "msg": "找不到工作"}), 404
+    return jsonify({"status": "success", "job": job})
+
+@app.route('/api/print/queue')
+def print_queue_stats():
+    """各狀態工作數"""
+    return jsonify({"status": "success", "jobs": printQueueUtil.stats()})
+
+@app.route('/health')
+def health():
+    """存活檢查：HTTP 伺服器運作中即回 200"""
+    return jsonify({"status": "ok", "uptime_sec": readinessUtil.status()["uptime_sec"]})
+
+@app.route('/ready')
+def ready():
+    """就緒檢查：列印佇列（擁有者另含字型與印表機）狀態，全部就緒前回 503"""
+    result = readinessUtil.status()
+    return jsonify(result), 200 if result["ready"] else 503
+
+@app.route('/metrics')
+def metrics():
+    """啟動各階段耗時（startup.*_sec、startup_to_ready_sec）等指標"""
+    return jsonify(metricsUtil.snapshot())
+
+@app.route('/trace/dump', methods=['POST'])
+def trace_dump():
+    """匯出請求追蹤（需以 KINECT_TRACE=1 啟動）"""
+    if not traceUtil.is_enabled():
+        return jsonify({"status": "error", "msg": "tracing disabled (KINECT_TRACE=1)"}), 400
+    return jsonify({"status": "success", "path": traceUtil.dump()})
 
 if __name__ == '__main__':
-    # 預先連線
-
-    get_printer()
-    
-    print("服務啟動中... Port: 4000")
-    # 使用 Port 4000 (依照您的設定)
-    app.run(host='0.0.0.0', port=4000, debug=False, threaded=True)
+    # 多個 server.py 行程各自一個記錄檔 / 追蹤名稱（logs/server-4000.jsonl、server-4001.jsonl…）
+    logUtil.set_process_name(f"server-{PRINT_SERVER_PORT}")
+    if traceUtil.is_enabled():
+        traceUtil.set_process_name(f"server-{PRINT_SERVER_PORT}")
+        traceUtil.install_signal_handler()
+
+    # 開啟佇列 / 載入字型 / 連線改在背景進行，伺服器先 bind（狀態見 /ready）
+    readinessUtil.register("print_queue")
+    if PRINT_QUEUE_OWNER:
+        readinessUtil.register("fonts", "printer", "print_owner")
+    threading.Thread(target=startup_worker, name="startup", daemon=True).start()
+
+    print(f"服務啟動中... Port: {PRINT_SERVER_PORT}（{'接受請求 + 列印' if PRINT_QUEUE_OWNER else '只接受請求'}）")
+    # 預設 Port 4000 (依照您的設定)
+    app.run(host='0.0.0.0', port=PRINT_SERVER_PORT, debug=False, threaded=True)
 
     # execute_print_job()
\ No newline at end of file
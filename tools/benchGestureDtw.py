@@ -0,0 +1,104 @@
+"""DTW 樣板手勢辨識基準測試
+
+以合成手勢產生樣板庫（寫成 JSON 檔，與實際錄製的樣板同格式），量測：
+- 樣板庫載入時間
+- 每幀辨識耗時（平均 / p99）、每秒可處理幀數、每秒樣板比對數
+- LB_Keogh 剪枝率（只有少數樣板需要完整 DTW）
+- 串流中各手勢的辨識結果與站立時的誤觸發
+
+用法（於專案根目錄）:
+    python tools/benchGestureDtw.py --templates 48 --rounds 5
+
+需求: numpy、pykinect_azure（只用到常數，不需 Kinect 硬體）
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import gestureDtwUtil, syntheticSkeletonUtil  # noqa: E402
+
+FRAME_BUDGET_MS = 1000.0 / 30
+
+
+def build_template_dir(directory, count, rng):
+    gestures = syntheticSkeletonUtil.GESTURES
+    for i in range(count):
+        name = gestures[i % len(gestures)]
+        frames = syntheticSkeletonUtil.gesture_frames(name, int(rng.integers(24, 45)), rng)
+        gestureDtwUtil.save_template_file(os.path.join(directory, f"{name}_{i:03d}.json"), name, frames)
+
+
+def build_stream(rounds, rng):
+    """站立 → 手勢 → 站立 … 的骨架串流，回傳 (frames, [(手勢, 結束幀)])"""
+    frames, expected = [], []
+    for _ in range(rounds):
+        for name in syntheticSkeletonUtil.GESTURES:
+            frames.extend(syntheticSkeletonUtil.idle_frames(45, rng))
+            frames.extend(syntheticSkeletonUtil.gesture_frames(name, int(rng.integers(24, 45)), rng))
+            expected.append((name, len(frames)))
+    frames.extend(syntheticSkeletonUtil.idle_frames(45, rng))
+    return frames, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DTW 樣板手勢辨識基準測試")
+    parser.add_argument("--templates", type=int, default=48, help="樣板數")
+    parser.add_argument("--rounds", type=int, default=5, help="每種手勢在串流中出現次數")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        build_template_dir(directory, args.templates, rng)
+        start = time.perf_counter()
+        library = gestureDtwUtil.load_library(directory)
+        load_ms = (time.perf_counter() - start) * 1000.0
+
+    frames, expected = build_stream(args.rounds, rng)
+    recognizer = gestureDtwUtil.GestureRecognizer(library)
+    durations, hits = [], []
+    for i, skeleton in enumerate(frames):
+        t0 = time.perf_counter()
+        match = recognizer.update(skeleton)
+        durations.append((time.perf_counter() - t0) * 1000.0)
+        if match is not None:
+            hits.append((i, match[0]))
+
+    # 手勢結束前後一個樣板長度內的辨識視為命中，其餘為誤觸發
+    matched, false_hits = 0, 0
+    remaining = list(expected)
+    for i, name in hits:
+        found = next((e for e in remaining if e[0] == name and e[1] - 50 <= i <= e[1] + 10), None)
+        if found is not None:
+            matched += 1
+            remaining.remove(found)
+        else:
+            false_hits += 1
+
+    total_s = sum(durations) / 1000.0
+    stats = recognizer.stats
+    durations.sort()
+    p99 = durations[min(len(durations) - 1, int(0.99 * (len(durations) - 1)))]
+    mean = sum(durations) / len(durations)
+    pruned = 1.0 - stats["dtw_computed"] / stats["lb_computed"] if stats["lb_computed"] else 0.0
+
+    print(f"樣板數:            {len(library)}  (load {load_ms:.1f} ms, {load_ms / max(1, len(library)):.2f} ms/樣板)")
+    print(f"幀數:              {len(frames)}")
+    print(f"每幀耗時:          mean {mean:.3f} ms / p99 {p99:.3f} ms / max {durations[-1]:.3f} ms "
+          f"(預算 {FRAME_BUDGET_MS:.1f} ms)")
+    print(f"處理速度:          {len(frames) / total_s:,.0f} 幀/s, {stats['lb_computed'] / total_s:,.0f} 樣板比對/s")
+    print(f"LB_Keogh 剪枝率:   {pruned * 100:.1f}%  (完整 DTW {stats['dtw_computed']} 次, "
+          f"提早放棄 {stats['dtw_abandoned']} 次)")
+    print(f"辨識:              {matched}/{len(expected)} 命中, 誤觸發 {false_hits}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""大量記錄下的偵測延遲基準測試：同步 print vs logUtil 非同步記錄
+
+以合成骨架來源驅動管線（同行程），另開執行緒以 --flood 筆/秒 灌記錄（模擬列印摘要、狀態行），
+逐幀的 DEBUG 記錄不取樣；子行程的 stdout 接到一個讀得很慢的 pipe（--console-bps），
+模擬 Windows 主控台 / 被導向的 pipe 卡住的情況。量測每個事件從擷取到送出的延遲。
+
+模式：
+    quiet  只記錄 ERROR（基準）
+    async  logUtil：熱路徑只 append 到佇列，背景執行緒寫檔 + 回顯
+    sync   把 logUtil.log 換成同步 print + 寫檔（等同改版前直接 print）
+
+用法（於專案根目錄）:
+    python tools/benchLogging.py --duration 20 --flood 2000
+
+需求: numpy、pykinect_azure（只用到常數，不需 Kinect 硬體）
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("quiet", "async", "sync")
+
+
+def _install_sync_log(log_dir):
+    """改版前的行為：呼叫端直接格式化、print、寫檔"""
+    from utils import logUtil
+
+    path = os.path.join(log_dir, "sync.jsonl")
+    log_file = open(path, "a", encoding="utf-8")
+    lock = threading.Lock()
+
+    def sync_log(level, source, msg, **fields):
+        text = msg.format(**fields) if fields else msg
+        with lock:
+            print(text, flush=True)
+            log_file.write(json.dumps({"ts": time.time(), "level": level, "src": source, "msg": text},
+                                      ensure_ascii=False) + "\n")
+            log_file.flush()
+
+    logUtil.log = sync_log
+
+
+def _flood_worker(rate, stop):
+    """以固定速率送出 INFO 記錄（每 10ms 一批）"""
+    from utils import logUtil
+
+    batch = max(1, int(rate / 100))
+    i = 0
+    while not stop.is_set():
+        for _ in range(batch):
+            i += 1
+            logUtil.info("Bench", "🧾 [Bench] 列印摘要 #{n}: 等級{grade} / {seconds}s / {percent}%",
+                         n=i, grade="B", seconds=120, percent=73.5)
+        time.sleep(0.01)
+
+
+def run_child(mode, duration, flood, motion_period, result_path):
+    import pipeline
+    from utils import logUtil
+
+    if mode == "sync":
+        _install_sync_log(logUtil.LOG_DIR)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def record(capture_ts):
+        now = time.time()
+        with lock:
+            latencies.append((now - capture_ts) * 1000.0)
+
+    source_device, source_tracker = pipeline.open_source(f"synthetic:{motion_period}")
+    pipeline.start_pipeline(source_device, source_tracker,
+                            lambda event, data, frame_seq, capture_ts: record(capture_ts))
+
+    stop = threading.Event()
+    if mode != "quiet":
+        threading.Thread(target=_flood_worker, args=(flood, stop), daemon=True).start()
+
+    time.sleep(duration)
+    stop.set()
+    with lock:
+        result = {"mode": mode, "duration": duration, "latencies_ms": list(latencies),
+                  "log_dropped": logUtil.dropped()}
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os._exit(0)
+
+
+def _slow_reader(stream, bps):
+    """以 bps 位元組/秒 讀取子行程 stdout，讀不完的留在 pipe 中讓寫入端阻塞"""
+    chunk = 1024
+    while True:
+        data = stream.read1(chunk) if hasattr(stream, "read1") else stream.read(chunk)
+        if not data:
+            return
+        time.sleep(len(data) / bps)
+
+
+def summarize(result):
+    values = sorted(result["latencies_ms"])
+    if not values:
+        return None
+
+    def pct(p):
+        return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+    return {
+        "mode": result["mode"],
+        "events": len(values),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": values[-1],
+        "jitter_ms": statistics.pstdev(values),
+        "log_dropped": result["log_dropped"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步 print vs 非同步記錄 偵測延遲基準測試")
+    parser.add_argument("--duration", type=float, default=20.0, help="每種模式量測秒數")
+    parser.add_argument("--flood", type=int, default=2000, help="額外記錄筆數 / 秒")
+    parser.add_argument("--console-bps", type=int, default=32 * 1024, help="主控台讀取速度（位元組/秒）")
+    parser.add_argument("--motion-period", type=float, default=1.0, help="合成動作循環秒數")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", help="將摘要另存為 JSON")
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_child(args.run_mode, args.duration, args.flood, args.motion_period, args.result)
+        return 0
+
+    summaries = []
+    print(f"{'mode':>6} {'events':>6} {'p50ms':>7} {'p90ms':>7} {'p99ms':>7} {'maxms':>8} {'jitter':>7} {'dropped':>8}")
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        with tempfile.TemporaryDirectory() as log_dir:
+            env = dict(os.environ, KINECT_ADAPTIVE_IDLE="0", KINECT_LOG_DIR=log_dir,
+                       KINECT_LOG_SAMPLE="", KINECT_LOG_CONSOLE_LEVEL="DEBUG",
+                       KINECT_LOG_LEVEL="ERROR" if mode == "quiet" else "DEBUG")
+            result_path = os.path.join(log_dir, "result.json")
+            child = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--run-mode", mode, "--result", result_path,
+                 "--duration", str(args.duration), "--flood", str(args.flood),
+                 "--motion-period", str(args.motion_period)],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            threading.Thread(target=_slow_reader, args=(child.stdout, args.console_bps), daemon=True).start()
+            try:
+                child.wait(timeout=args.duration + 30)
+            except subprocess.TimeoutExpired:
+                child.kill()
+            if not os.path.exists(result_path):
+                print(f"❌ {mode} 執行失敗 (exit={child.returncode})")
+                continue
+            with open(result_path, "r", encoding="utf-8") as f:
+                summary = summarize(json.load(f))
+        if summary is None:
+            print(f"⚠️ {mode} 沒有產生任何事件")
+            continue
+        summaries.append(summary)
+        print(f"{mode:>6} {summary['events']:>6} {summary['p50_ms']:>7.1f} {summary['p90_ms']:>7.1f} "
+              f"{summary['p99_ms']:>7.1f} {summary['max_ms']:>8.1f} {summary['jitter_ms']:>7.2f} "
+              f"{summary['log_dropped']:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
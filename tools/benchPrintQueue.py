@@ -0,0 +1,152 @@
+"""列印佇列寫入吞吐量基準測試：多個 server.py 接單行程同時寫入同一個 SQLite（WAL）佇列
+
+每種組合啟動 N 個只接單的 server.py（PRINT_QUEUE_OWNER=0，各自一個 port、共用暫存資料庫），
+以 --clients 個執行緒輪流對各行程送 POST /api/print，其中 --resend 比例為帶相同 Idempotency-Key 的重送。
+量測每秒寫入數與請求延遲，最後檢查資料庫筆數 = 不重複的 key 數（重送沒有產生重複工作）。
+
+用法（於專案根目錄）:
+    python tools/benchPrintQueue.py --workers 1,2,4 --clients 16 --requests 4000
+    python tools/benchPrintQueue.py --sync NORMAL
+
+需求: flask、flask-cors、Pillow、pyusb（server.py 的 import；不需印表機）
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASE_PORT = 4100
+
+
+def wait_ready(port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1.0):
+                return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.05)
+    return False
+
+
+def post_job(port, key):
+    body = json.dumps({"watchSeconds": 42, "watchedPercent": 73.5}).encode()
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/api/print", data=body, method="POST",
+                                 headers={"Content-Type": "application/json", "Idempotency-Key": key})
+    with urllib.request.urlopen(req, timeout=10.0) as resp:
+        return json.loads(resp.read())
+
+
+def run_load(ports, clients, total, resend, seed):
+    """回傳 (延遲清單 ms, 錯誤數, 不重複 key 數, 耗時秒)"""
+    rng = random.Random(seed)
+    plan = []
+    for i in range(total):
+        if plan and rng.random() < resend:
+            plan.append(rng.choice(plan))   # 重送先前的某一筆
+        else:
+            plan.append(f"bench-{seed}-{i}")
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    next_index = [0]
+
+    def client_worker(client_id):
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if i >= total:
+                return
+            start = time.perf_counter()
+            try:
+                post_job(ports[(client_id + i) % len(ports)], plan[i])
+                ok = True
+            except (urllib.error.URLError, OSError, ValueError):
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000.0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client_worker, args=(c,), daemon=True) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], len(set(plan)), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列印佇列多行程寫入吞吐量基準測試")
+    parser.add_argument("--workers", default="1,2,4", help="接單行程數（逗號分隔多組）")
+    parser.add_argument("--clients", type=int, default=16, help="同時送出請求的執行緒數")
+    parser.add_argument("--requests", type=int, default=4000, help="每組請求總數")
+    parser.add_argument("--resend", type=float, default=0.1, help="重送（相同 Idempotency-Key）比例")
+    parser.add_argument("--sync", default="FULL", choices=("FULL", "NORMAL"), help="SQLite synchronous 設定")
+    parser.add_argument("--json", help="將摘要另存為 JSON")
+    args = parser.parse_args()
+
+    summaries = []
+    print(f"{'workers':>7} {'req':>6} {'req/s':>8} {'p50ms':>7} {'p99ms':>7} {'maxms':>7} {'errors':>6} "
+          f"{'jobs':>6} {'unique':>6}")
+    for n_workers in [int(v) for v in args.workers.split(",") if v.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "print_queue.db")
+            env = dict(os.environ, PRINT_QUEUE_DB=db_path, PRINT_QUEUE_SYNC=args.sync,
+                       PRINT_QUEUE_OWNER="0", KINECT_LOG_DIR=tmp)
+            ports = [BASE_PORT + i for i in range(n_workers)]
+            procs = [subprocess.Popen([sys.executable, "server.py"], cwd=ROOT,
+                                      env=dict(env, PRINT_SERVER_PORT=str(port)),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                     for port in ports]
+            try:
+                if not all(wait_ready(port) for port in ports):
+                    print(f"❌ {n_workers} 個接單行程未就緒")
+                    continue
+                latencies, errors, unique, elapsed = run_load(ports, args.clients, args.requests,
+                                                              args.resend, seed=n_workers)
+            finally:
+                for p in procs:
+                    p.terminate()
+                for p in procs:
+                    p.wait()
+            with sqlite3.connect(db_path) as conn:
+                jobs = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+        latencies.sort()
+        if not latencies:
+            print(f"⚠️ {n_workers} 個接單行程沒有成功的請求")
+            continue
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))]
+
+        summary = {"workers": n_workers, "requests": args.requests, "sync": args.sync,
+                   "req_per_sec": len(latencies) / elapsed, "p50_ms": pct(50), "p99_ms": pct(99),
+                   "max_ms": latencies[-1], "errors": errors, "jobs": jobs, "unique_keys": unique}
+        summaries.append(summary)
+        print(f"{n_workers:>7} {args.requests:>6} {summary['req_per_sec']:>8.0f} {summary['p50_ms']:>7.1f} "
+              f"{summary['p99_ms']:>7.1f} {summary['max_ms']:>7.1f} {errors:>6} {jobs:>6} {unique:>6}"
+              f"{'' if jobs == unique or errors else '  ⚠️ 筆數不符'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
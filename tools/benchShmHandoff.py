@@ -0,0 +1,149 @@
+"""擷取 → 偵測 交接方式基準測試：同行程執行緒 vs 共享記憶體 + 獨立偵測行程
+
+以合成骨架來源驅動管線，主要量測「逐幀」擷取 → 偵測 worker 拿到該幀的延遲
+（pipeline 的 frame_to_detect_ms，每個偵測 worker 每幀一筆，30fps × 2 個 worker，
+樣本數足以看 p99；分位數取最近 metricsUtil.SUMMARY_WINDOW 筆）。
+事件（舉手 / 踢腿）延遲一併列出，但每秒只有數筆，只供參考，請看樣本數。
+--load-threads 在擷取 / 伺服器行程中加入純 Python 忙碌執行緒，模擬 Werkzeug 請求處理與
+Socket.IO 編碼搶 GIL 的情況（單行程模式下偵測 workers 也在這個行程裡）。
+
+用法（於專案根目錄）:
+    python tools/benchShmHandoff.py --duration 30 --load-threads 0,2,4
+
+需求: numpy、pykinect_azure（只用到常數，不需 Kinect 硬體）
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("single", "shm")
+
+
+def _busy_worker(stop):
+    """模擬伺服器負載：反覆 JSON 編解碼（持有 GIL 的純 Python 工作）"""
+    doc = {"watchSeconds": 120, "watchedPercent": 73.5, "items": list(range(200)), "name": "x" * 64}
+    while not stop.is_set():
+        json.loads(json.dumps(doc))
+
+
+def run_child(mode, duration, load_threads, motion_period):
+    import pipeline
+    import sensors
+    from utils import metricsUtil
+
+    latencies = []
+    lock = threading.Lock()
+
+    def record(capture_ts):
+        now = time.time()
+        with lock:
+            latencies.append((now - capture_ts) * 1000.0)
+
+    spec = f"synthetic:{motion_period}"
+    if mode == "single":
+        source_device, source_tracker = pipeline.open_source(spec)
+        pipeline.start_pipeline(source_device, source_tracker,
+                                lambda event, data, frame_seq, capture_ts: record(capture_ts))
+    else:
+        sensors.start_shm_detection(spec, lambda sensor_id, event, data, frame_seq, capture_ts: record(capture_ts))
+
+    stop = threading.Event()
+    for _ in range(load_threads):
+        threading.Thread(target=_busy_worker, args=(stop,), daemon=True).start()
+
+    time.sleep(duration)
+    stop.set()
+    if mode == "single":
+        frame_summary = metricsUtil.snapshot()["summaries"].get("frame_to_detect_ms")
+    else:
+        # 偵測行程每 METRICS_REPORT_INTERVAL 秒回報一次指標
+        time.sleep(pipeline.METRICS_REPORT_INTERVAL * 1.5)
+        frame_summary = ((sensors.detection_status().get("metrics") or {}).get("summaries") or {}).get(
+            "frame_to_detect_ms")
+        sensors.stop_shm_detection()
+    with lock:
+        result = {"mode": mode, "load_threads": load_threads, "duration": duration,
+                  "latencies_ms": list(latencies), "frame_summary": frame_summary}
+    print(json.dumps(result), flush=True)
+    # daemon 執行緒隨之結束（shm ring 已在上面 unlink）
+    os._exit(0)
+
+
+def summarize(result):
+    values = sorted(result["latencies_ms"])
+
+    def pct(p):
+        if not values:
+            return float("nan")
+        return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+    frame = result.get("frame_summary") or {}
+    return {
+        "mode": result["mode"],
+        "load_threads": result["load_threads"],
+        "frame_samples": frame.get("count", 0),
+        "frame_p50_ms": frame.get("p50", float("nan")),
+        "frame_p90_ms": frame.get("p90", float("nan")),
+        "frame_p99_ms": frame.get("p99", float("nan")),
+        "frame_max_ms": frame.get("max", float("nan")),
+        "events": len(values),
+        "event_p50_ms": pct(50),
+        "event_p99_ms": pct(99),
+        "event_jitter_ms": statistics.pstdev(values) if values else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同行程 vs 共享記憶體偵測行程 延遲基準測試")
+    parser.add_argument("--duration", type=float, default=30.0, help="每種組合量測秒數")
+    parser.add_argument("--load-threads", default="0,2,4", help="模擬伺服器負載的忙碌執行緒數")
+    parser.add_argument("--motion-period", type=float, default=1.0, help="合成動作循環秒數")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", help="將摘要另存為 JSON")
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--run-load", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_child(args.run_mode, args.duration, args.run_load, args.motion_period)
+        return 0
+
+    env = dict(os.environ, KINECT_ADAPTIVE_IDLE="0", KINECT_LOG_DIR="")
+    summaries = []
+    print(f"{'mode':>6} {'load':>4} {'frames':>7} {'f_p50':>7} {'f_p90':>7} {'f_p99':>7} {'f_max':>7} "
+          f"{'events':>6} {'e_p50':>7} {'e_p99':>7}   (ms)")
+    for load in [int(v) for v in args.load_threads.split(",") if v.strip()]:
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-mode", mode, "--run-load", str(load),
+                 "--duration", str(args.duration), "--motion-period", str(args.motion_period)],
+                cwd=ROOT, env=env, capture_output=True, text=True)
+            lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+            if not lines:
+                print(f"❌ {mode} (load={load}) 執行失敗:\n{out.stderr[-2000:]}")
+                continue
+            summary = summarize(json.loads(lines[-1]))
+            if not summary["frame_samples"]:
+                print(f"⚠️ {mode} (load={load}) 沒有逐幀樣本")
+                continue
+            summaries.append(summary)
+            print(f"{mode:>6} {load:>4} {summary['frame_samples']:>7} {summary['frame_p50_ms']:>7.2f} "
+                  f"{summary['frame_p90_ms']:>7.2f} {summary['frame_p99_ms']:>7.2f} {summary['frame_max_ms']:>7.1f} "
+                  f"{summary['events']:>6} {summary['event_p50_ms']:>7.1f} {summary['event_p99_ms']:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
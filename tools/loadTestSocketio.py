@@ -0,0 +1,238 @@
+"""Socket.IO 扇出壓力測試
+
+以合成骨架來源（KINECT_SOURCE=synthetic）啟動 main.py，逐步增加模擬 client 數量，
+量測每一階段的事件送達延遲、事件遺失率與伺服器 CPU 使用率。
+
+用法（於專案根目錄）:
+    python tools/loadTestSocketio.py --spawn --steps 50,100,200,400 --duration 20
+    python tools/loadTestSocketio.py --url http://127.0.0.1:5000 --pid 1234
+
+需求: pip install "python-socketio[client]" psutil（psutil 沒裝就不量 CPU）
+
+延遲定義：事件 payload 的擷取時間 ts 到 client 收到的時間差（同一台機器，時鐘一致）。
+遺失定義：該階段伺服器廣播的事件（/metrics 的 last_event_seq 於階段開始 / 結束時的值界定序號範圍），
+等 --settle 秒讓最後幾個事件送達後，各 client 沒收到的比例。
+加上 --ack 時 client 會回 event_ack，伺服器端的 擷取→ack 分位數一併列出。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS = ("hand_event", "kick_event")
+TEARDOWN_WORKERS = 100  # 結束時同時斷線的 client 數
+
+
+class SimClient:
+    """單一模擬顯示端：記錄每個事件的序號、擷取時間與送達時間"""
+
+    def __init__(self, url, ack=False):
+        self.url = url
+        self.ack = ack
+        self.sio = socketio.Client(reconnection=False)
+        self.arrivals = []
+        self._lock = threading.Lock()
+        for name in EVENTS:
+            self.sio.on(name, self._make_handler(name))
+
+    def _make_handler(self, name):
+        def handler(data=None):
+            now = time.time()
+            data = data or {}
+            if data.get("replay"):
+                return
+            with self._lock:
+                self.arrivals.append((data.get("seq"), data.get("ts"), now))
+            if self.ack and data.get("seq") is not None:
+                try:
+                    self.sio.emit("event_ack", {"seq": data["seq"]})
+                except Exception:
+                    pass
+        return handler
+
+    def connect(self):
+        self.sio.connect(self.url, transports=["websocket"], wait_timeout=10)
+
+    def take_arrivals(self, lo, hi):
+        """序號在 [lo, hi] 的到達記錄"""
+        with self._lock:
+            return [a for a in self.arrivals if a[0] is not None and lo <= a[0] <= hi]
+
+    def disconnect(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def fetch_metrics(url):
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/metrics", timeout=2) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def wait_for_server(url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if fetch_metrics(url) is not None:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def last_event_seq(metrics):
+    return int(metrics.get("gauges", {}).get("last_event_seq", 0))
+
+
+def analyze(per_client_arrivals, n_events):
+    """由序號與時間戳計算 擷取→送達 延遲與遺失率（n_events 為伺服器在該階段廣播的事件數）"""
+    latencies = []
+    received = 0
+    for arrivals in per_client_arrivals:
+        client_seqs = set()
+        for seq, ts, recv in arrivals:
+            if seq in client_seqs:
+                continue
+            client_seqs.add(seq)
+            if ts is not None:
+                latencies.append((recv - ts) * 1000.0)
+        received += len(client_seqs)
+
+    expected = n_events * len(per_client_arrivals)
+    loss = max(0.0, (expected - received) / expected) if expected else 0.0
+    return latencies, loss
+
+
+def run_step(url, clients, duration, settle, server_proc):
+    metrics_before = fetch_metrics(url) or {}
+    if server_proc is not None:
+        server_proc.cpu_percent(None)
+    time.sleep(duration)
+    cpu = server_proc.cpu_percent(None) if server_proc is not None else None
+    metrics_after = fetch_metrics(url) or {}
+
+    # 本階段廣播的事件序號範圍；再等 settle 秒，最後幾個事件送到慢的 client 才不會算成遺失
+    lo, hi = last_event_seq(metrics_before) + 1, last_event_seq(metrics_after)
+    n_events = max(0, hi - lo + 1)
+    time.sleep(settle)
+    latencies, loss = analyze([c.take_arrivals(lo, hi) for c in clients], n_events)
+
+    def dropped(m):
+        return m.get("counters", {}).get("emit_dropped", 0)
+
+    ack = metrics_after.get("summaries", {}).get("capture_to_ack_ms", {})
+
+    return {
+        "clients": len(clients),
+        "events": n_events,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else float("nan"),
+        "loss_pct": loss * 100.0,
+        "server_dropped": dropped(metrics_after) - dropped(metrics_before),
+        "cpu_pct": cpu,
+        "ack_p50_ms": ack.get("p50"),
+        "ack_p99_ms": ack.get("p99"),
+    }
+
+
+def print_row(r):
+    cpu = f"{r['cpu_pct']:6.1f}" if r["cpu_pct"] is not None else "   n/a"
+    ack = f"{r['ack_p50_ms']:>8.1f} {r['ack_p99_ms']:>8.1f}" if r["ack_p50_ms"] is not None else f"{'n/a':>8} {'n/a':>8}"
+    print(f"{r['clients']:>7} {r['events']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+          f"{r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['loss_pct']:>7.2f} {r['server_dropped']:>8} {cpu} {ack}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO 扇出壓力測試")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", action="store_true", help="以合成骨架來源啟動 main.py")
+    parser.add_argument("--pid", type=int, help="量測既有伺服器行程的 CPU（未使用 --spawn 時）")
+    parser.add_argument("--steps", default="50,100,200,400", help="逐步增加的 client 數")
+    parser.add_argument("--duration", type=float, default=20.0, help="每一階段量測秒數")
+    parser.add_argument("--warmup", type=float, default=3.0, help="連線完成後等待秒數")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="階段結束後等待最後幾個事件送達的秒數（應大於 p99 延遲）")
+    parser.add_argument("--motion-period", type=float, default=2.0, help="合成動作循環秒數")
+    parser.add_argument("--ack", action="store_true", help="client 收到事件後回 event_ack")
+    parser.add_argument("--json", help="將結果另存為 JSON")
+    args = parser.parse_args()
+
+    proc = None
+    if args.spawn:
+        env = dict(os.environ, KINECT_SOURCE="synthetic", SYNTHETIC_MOTION_PERIOD=str(args.motion_period))
+        proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server_proc = None
+    if psutil is not None and (proc is not None or args.pid):
+        server_proc = psutil.Process(proc.pid if proc is not None else args.pid)
+
+    clients = []
+    results = []
+    try:
+        if not wait_for_server(args.url):
+            print("❌ 伺服器未就緒（/metrics 無回應）")
+            return 1
+
+        print(f"{'clients':>7} {'events':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'maxms':>8} "
+              f"{'loss%':>7} {'dropped':>8} {'cpu%':>6} {'ack50ms':>8} {'ack99ms':>8}")
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            for target in [int(s) for s in args.steps.split(",") if s.strip()]:
+                new_clients = [SimClient(args.url, ack=args.ack) for _ in range(max(0, target - len(clients)))]
+                for c, exc in zip(new_clients, pool.map(_safe_connect, new_clients)):
+                    if exc is None:
+                        clients.append(c)
+                    else:
+                        print(f"⚠️ 連線失敗: {exc}")
+                time.sleep(args.warmup)
+                result = run_step(args.url, clients, args.duration, args.settle, server_proc)
+                results.append(result)
+                print_row(result)
+    finally:
+        # 先結束自己啟動的伺服器，client 端不必等關閉交握；每個 disconnect 仍需數秒，平行處理
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        with ThreadPoolExecutor(max_workers=TEARDOWN_WORKERS) as pool:
+            list(pool.map(SimClient.disconnect, clients))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def _safe_connect(client):
+    try:
+        client.connect()
+        return None
+    except Exception as e:
+        return e
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""錄製手勢樣板（供 DTW 手勢辨識使用）
+
+倒數後擷取最接近相機的人體骨架，錄下指定秒數，存成 gesture_templates/<手勢>_<時間>.json。
+同一個手勢建議由不同人、不同速度各錄幾次。
+
+用法（於專案根目錄）:
+    python tools/recordGestureTemplate.py wave --seconds 1.5
+    python tools/recordGestureTemplate.py squat --source playback:squat.mkv --countdown 0
+    python tools/recordGestureTemplate.py jump --source synthetic   # 無硬體時產生合成樣板
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pipeline  # noqa: E402
+from utils import gestureDtwUtil, syntheticSkeletonUtil  # noqa: E402
+
+
+def record(spec, seconds, countdown):
+    device, body_tracker = pipeline.open_source(spec)
+    if device is None:
+        raise RuntimeError(f"無法開啟骨架來源 {spec}")
+
+    for i in range(int(countdown), 0, -1):
+        print(f"⏳ {i}...")
+        time.sleep(1.0)
+    print("🔴 開始錄製")
+
+    frames, timestamps = [], []
+    last_frame_time = 0.0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        # 與管線相同的幀率限制：扣掉 device / tracker 耗時後才補睡，維持 30fps
+        elapsed = time.time() - last_frame_time
+        if elapsed < pipeline.FRAME_INTERVAL:
+            time.sleep(pipeline.FRAME_INTERVAL - elapsed)
+        last_frame_time = time.time()
+        capture = device.update()
+        capture_ts = time.time()
+        body_frame = body_tracker.update(capture)
+        body_id = pipeline.get_closest_body(body_frame)
+        if body_id is not None:
+            frames.append(body_frame.get_body(body_id).numpy().copy())
+            timestamps.append(capture_ts)
+    fps = (len(frames) - 1) / (timestamps[-1] - timestamps[0]) if len(frames) > 1 else 0.0
+    print(f"⏹️ 錄製結束，共 {len(frames)} 幀（實際 {fps:.1f} fps）")
+    return frames, timestamps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="錄製 DTW 手勢樣板")
+    parser.add_argument("gesture", help="手勢名稱（事件中的 gesture 欄位）")
+    parser.add_argument("--source", default="device", help="骨架來源：device[:n] / playback:檔案.mkv / synthetic")
+    parser.add_argument("--seconds", type=float, default=1.5, help="錄製秒數")
+    parser.add_argument("--countdown", type=float, default=3, help="開始前倒數秒數")
+    parser.add_argument("--threshold", type=float, default=gestureDtwUtil.DEFAULT_THRESHOLD,
+                        help="此樣板的比對門檻（平均每幀距離）")
+    parser.add_argument("--out-dir", default=pipeline.GESTURE_TEMPLATE_DIR,
+                        help="樣板目錄（預設與偵測端相同：KINECT_GESTURE_TEMPLATES 或專案下的 gesture_templates）")
+    args = parser.parse_args()
+
+    if args.source == "synthetic":
+        # 合成來源不會「做動作」，直接產生該手勢的合成序列
+        frames = syntheticSkeletonUtil.gesture_frames(args.gesture, int(args.seconds * gestureDtwUtil.TEMPLATE_FPS))
+        timestamps = None
+    else:
+        frames, timestamps = record(args.source, args.seconds, args.countdown)
+    if len(frames) < 5:
+        print("❌ 有效幀數不足（是否有人在畫面中？），未儲存")
+        return 1
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = os.path.join(args.out_dir, f"{args.gesture}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    gestureDtwUtil.save_template_file(path, args.gesture, frames, threshold=args.threshold,
+                                      timestamps=timestamps)
+    print(f"✅ 已儲存 {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import collections
+import queue
+import threading
+import time
+
+from utils import metricsUtil, traceUtil
+
+# 每個 client 的送出佇列上限；滿了就丟掉最舊的事件（顯示端只在乎最新狀態）
+CLIENT_QUEUE_SIZE = 64
+
+# 每個 namespace 保留最近的事件，client 重新連線時補送漏掉的部分
+REPLAY_BUFFER_SIZE = 256
+REPLAY_MAX_AGE = 10.0  # 秒；太舊的手勢對畫面已無意義，不補送
+
+# 本次啟動的識別碼：序號在重啟後歸零，client 以此判斷 last_seq 是否仍有效
+BOOT_ID = f"{int(time.time() * 1000):x}"
+
+_STOP = object()
+
+_emit_fn = None
+_clients = {}   # namespace -> {sid: queue}
+_seq = {}       # namespace -> 最後一個事件序號
+_replay = {}    # namespace -> deque[(seq, event, payload)]
+_sent_ts = {}   # (namespace, seq) -> (capture_ts, emit_ts)，供 ack 計算延遲
+_clients_lock = threading.Lock()
+
+
+def init(emit_fn):
+    """設定實際送出函式 emit_fn(event, data, sid, namespace)，通常包 socketio.emit(..., to=sid)"""
+    global _emit_fn
+    _emit_fn = emit_fn
+
+
+def register_client(sid, namespace='/', last_seq=None, boot=None):
+    """client 連線：建立專屬佇列與送出執行緒，慢的 client 只會卡住自己的執行緒
+
+    last_seq / boot 為 client 重新連線時帶上的最後收到序號與啟動識別碼，
+    有帶就把 replay buffer 中之後的事件先放進佇列補送。
+    送出執行緒立即開始送，呼叫時 CONNECT 確認須已送出（main.py 以 always_connect=True 保證）。
+    """
+    q = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    t = threading.Thread(target=_sender_worker, args=(sid, namespace, q), name=f"emit-{sid}", daemon=True)
+    with _clients_lock:
+        clients = _clients.setdefault(namespace, {})
+        old = clients.pop(sid, None)
+        clients[sid] = q
+        metricsUtil.set_gauge("socketio_clients", sum(len(c) for c in _clients.values()))
+        _offer(q, ("server_hello", {"boot": BOOT_ID, "seq": _seq.get(namespace, 0)}))
+        if last_seq is not None:
+            # 不同次啟動的序號不可比，補送本次啟動 buffer 內的全部事件
+            after = last_seq if boot == BOOT_ID else 0
+            replayed = _replay_since(namespace, after)
+            for event, payload in replayed:
+                _offer(q, (event, payload))
+            metricsUtil.inc("events_replayed", len(replayed))
+    if old is not None:
+        _offer(old, _STOP)
+    t.start()
+
+
+def unregister_client(sid, namespace='/'):
+    """client 斷線：通知送出執行緒結束"""
+    with _clients_lock:
+        q = _clients.get(namespace, {}).pop(sid, None)
+        metricsUtil.set_gauge("socketio_clients", sum(len(c) for c in _clients.values()))
+    if q is not None:
+        _offer(q, _STOP)
+
+
+def broadcast(event, data, frame_seq=None, capture_ts=None, namespace='/'):
+    """為事件加上序號與時間戳、存入 replay buffer，放進所有 client 的佇列後立即返回
+
+    不在呼叫端（偵測執行緒）做任何網路 I/O。回傳事件序號。
+    """
+    emit_ts = time.time()
+    with _clients_lock:
+        seq = _seq.get(namespace, 0) + 1
+        _seq[namespace] = seq
+        if namespace == '/':
+            # 外部（壓力測試）以 /metrics 的最後序號界定一段期間內廣播了哪些事件
+            metricsUtil.set_gauge("last_event_seq", seq)
+        payload = dict(data)
+        payload.update({
+            "id": f"{BOOT_ID}-{seq}",
+            "seq": seq,
+            "boot": BOOT_ID,
+            "frame": frame_seq,
+            "ts": capture_ts if capture_ts is not None else emit_ts,
+            "emit_ts": emit_ts,
+        })
+        replay = _replay.get(namespace)
+        if replay is None:
+            replay = _replay[namespace] = collections.deque(maxlen=REPLAY_BUFFER_SIZE)
+        if len(replay) == replay.maxlen:
+            _sent_ts.pop((namespace, replay[0][0]), None)
+        replay.append((seq, event, payload))
+        _sent_ts[(namespace, seq)] = (payload["ts"], emit_ts)
+        queues = list(_clients.get(namespace, {}).values())
+    for q in queues:
+        _offer(q, (event, payload))
+    metricsUtil.inc("events_broadcast")
+    return seq
+
+
+def acknowledge(seq, namespace='/'):
+    """client 回報已收到（並處理完）某序號事件：記錄 擷取→ack 與 送出→ack 延遲"""
+    now = time.time()
+    with _clients_lock:
+        stamps = _sent_ts.get((namespace, seq))
+    if stamps is None:
+        metricsUtil.inc("event_acks_unknown")
+        return False
+    capture_ts, emit_ts = stamps
+    metricsUtil.inc("event_acks")
+    metricsUtil.observe("capture_to_ack_ms", (now - capture_ts) * 1000.0)
+    metricsUtil.observe("emit_to_ack_ms", (now - emit_ts) * 1000.0)
+    return True
+
+
+def _replay_since(namespace, after_seq):
+    """回傳 replay buffer 中序號大於 after_seq 且未過期的事件（呼叫端需持有 _clients_lock）"""
+    cutoff = time.time() - REPLAY_MAX_AGE
+    return [(event, dict(payload, replay=True))
+            for seq, event, payload in _replay.get(namespace, ())
+            if seq > after_seq and payload["emit_ts"] >= cutoff]
+
+
+def _offer(q, item):
+    """非阻塞放入；佇列滿時丟棄最舊一筆再放"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+                metricsUtil.inc("emit_dropped")
+            except queue.Empty:
+                pass
+
+
+def _sender_worker(sid, namespace, q):
+    """【送出 Worker】逐一把佇列中的事件送給單一 client"""
+    while True:
+        item = q.get()
+        if item is _STOP:
+            return
+        event, data = item
+        try:
+            with traceUtil.span("socketio.emit", "emit", {"event": event}):
+                _emit_fn(event, data, sid, namespace)
+            metricsUtil.inc("emit_sent")
+        except Exception:
+            metricsUtil.inc("emit_errors")
@@ -0,0 +1,278 @@
+import glob
+import json
+import math
+import os
+
+import numpy as np
+import pykinect_azure as pykinect
+
+# 樣板式手勢辨識：最近 N 幀骨架（以身體為基準正規化）與錄製好的手勢樣板做 DTW 比對。
+# 每幀先以向量化的 LB_Keogh 下界一次算完所有樣板，只有下界低於門檻 / 目前最佳值的樣板
+# 才做完整的帶狀 DTW（且逐列提早放棄），數十個樣板在 30fps 下單核即可負擔。
+
+RESAMPLE_LENGTH = 32      # 視窗與樣板都重新取樣成固定長度，吸收整體速度差異
+BAND_RATIO = 0.1          # Sakoe-Chiba 帶寬（佔長度比例），吸收局部快慢
+DEFAULT_THRESHOLD = 0.25  # 平均每幀距離（軀幹長度單位的平方和）門檻，樣板可各自覆寫
+TEMPLATE_FPS = 30         # 偵測端每秒幀數；樣板載入時重新取樣到此幀率，長度（幀數）才與滑動視窗一致
+
+# 參與比對的關節（相對骨盆、以軀幹長度縮放、轉到面向相機的座標）
+FEATURE_JOINTS = (
+    pykinect.K4ABT_JOINT_HEAD,
+    pykinect.K4ABT_JOINT_ELBOW_LEFT,
+    pykinect.K4ABT_JOINT_HAND_LEFT,
+    pykinect.K4ABT_JOINT_ELBOW_RIGHT,
+    pykinect.K4ABT_JOINT_HAND_RIGHT,
+    pykinect.K4ABT_JOINT_KNEE_LEFT,
+    pykinect.K4ABT_JOINT_ANKLE_LEFT,
+    pykinect.K4ABT_JOINT_KNEE_RIGHT,
+    pykinect.K4ABT_JOINT_ANKLE_RIGHT,
+)
+FEATURE_DIM = len(FEATURE_JOINTS) * 3 + 3  # 最後 3 維為骨盆相對視窗起點的位移（跳、蹲）
+# 骨盆位移只有 3 維，相對 27 維關節特徵加權，否則「跳」與站著不動的距離太小
+PELVIS_WEIGHT = 3.0
+
+
+def frame_features(skeleton):
+    """單幀骨架 (32, >=3) → (關節特徵, 骨盆位置/軀幹長度)
+
+    平移到骨盆、依左右髖連線轉成正面、除以骨盆到頸部的長度，消除站位、朝向與身高差異。
+    """
+    joints = np.asarray(skeleton, dtype=np.float64)[:, :3]
+    pelvis = joints[pykinect.K4ABT_JOINT_PELVIS]
+    torso = np.linalg.norm(joints[pykinect.K4ABT_JOINT_NECK] - pelvis) + 1e-6
+
+    hips = joints[pykinect.K4ABT_JOINT_HIP_RIGHT] - joints[pykinect.K4ABT_JOINT_HIP_LEFT]
+    yaw = math.atan2(hips[2], hips[0])
+    c, s = math.cos(yaw), math.sin(yaw)
+    # 繞 Y 軸旋轉 -yaw，使左右髖連線對齊 +X
+    rot = np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+
+    rel = (joints[list(FEATURE_JOINTS)] - pelvis) @ rot.T / torso
+    return rel.reshape(-1), pelvis / torso
+
+
+def resample(seq, length=RESAMPLE_LENGTH):
+    """沿時間軸線性內插成固定長度 (length, D)"""
+    seq = np.asarray(seq, dtype=np.float64)
+    n = len(seq)
+    if n == length:
+        return seq.copy()
+    pos = np.linspace(0.0, n - 1, length)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, n - 1)
+    frac = (pos - lo)[:, None]
+    return seq[lo] * (1.0 - frac) + seq[hi] * frac
+
+
+def sequence_features(joint_feats, pelvis):
+    """多幀特徵組成比對用序列：關節特徵 + 骨盆相對第一幀的位移"""
+    joint_feats = np.asarray(joint_feats)
+    pelvis = np.asarray(pelvis)
+    return np.hstack([joint_feats, (pelvis - pelvis[0]) * PELVIS_WEIGHT])
+
+
+def envelope(seq, band):
+    """LB_Keogh 上下包絡：每個時間點 ±band 範圍內的最大 / 最小值"""
+    padded = np.pad(seq, ((band, band), (0, 0)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * band + 1, axis=0)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def lb_keogh(queries, upper, lower):
+    """向量化 LB_Keogh：queries / upper / lower 皆為 (K, L, D)，回傳 (K,) 下界"""
+    above = np.maximum(queries - upper, 0.0)
+    below = np.maximum(lower - queries, 0.0)
+    return (above * above + below * below).sum(axis=(1, 2))
+
+
+def dtw_distance(a, b, band, best=math.inf):
+    """帶狀 DTW（逐幀平方歐氏距離），任一列最小值超過 best 即提早放棄回傳 inf"""
+    length = len(a)
+    diff = a[:, None, :] - b[None, :, :]
+    cost = (diff * diff).sum(axis=-1).tolist()
+    inf = math.inf
+    prev = [inf] * (length + 1)
+    prev[0] = 0.0
+    for i in range(1, length + 1):
+        cur = [inf] * (length + 1)
+        row = cost[i - 1]
+        lo = max(1, i - band)
+        hi = min(length, i + band)
+        row_min = inf
+        for j in range(lo, hi + 1):
+            left = cur[j - 1]
+            up = prev[j]
+            diag = prev[j - 1]
+            m = diag if diag < up else up
+            if left < m:
+                m = left
+            value = row[j - 1] + m
+            cur[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > best:
+            return inf
+        prev = cur
+    return prev[length]
+
+
+class GestureTemplate:
+    def __init__(self, template_id, gesture, frames, threshold=DEFAULT_THRESHOLD):
+        """frames: 原始骨架序列 (n, 32, >=3)，mm"""
+        feats = [frame_features(f) for f in frames]
+        self.template_id = template_id
+        self.gesture = gesture
+        self.threshold = threshold
+        self.length = len(frames)
+        self.sequence = resample(sequence_features([f[0] for f in feats], [f[1] for f in feats]))
+
+
+class GestureLibrary:
+    """樣板集合：疊成 (K, L, D) 陣列並預先算好包絡，供每幀向量化下界計算"""
+
+    def __init__(self, templates, length=RESAMPLE_LENGTH, band_ratio=BAND_RATIO):
+        self.templates = list(templates)
+        self.length = length
+        self.band = max(1, int(round(length * band_ratio)))
+        if self.templates:
+            self.sequences = np.stack([t.sequence for t in self.templates])
+            envelopes = [envelope(seq, self.band) for seq in self.sequences]
+            self.upper = np.stack([e[0] for e in envelopes])
+            self.lower = np.stack([e[1] for e in envelopes])
+            self.thresholds = np.array([t.threshold for t in self.templates]) * length
+            self.lengths = np.array([t.length for t in self.templates])
+        self.max_length = int(self.lengths.max()) if self.templates else 0
+
+    def __len__(self):
+        return len(self.templates)
+
+
+def resample_to_fps(frames, timestamps, fps=TEMPLATE_FPS):
+    """依每幀時間戳（秒）把骨架序列線性內插成固定幀率，吸收錄製時掉幀 / 幀率不穩"""
+    frames = np.asarray(frames, dtype=np.float64)
+    t = np.asarray(timestamps, dtype=np.float64)
+    t = t - t[0]
+    n = max(2, int(round(t[-1] * fps)) + 1)
+    target = np.linspace(0.0, t[-1], n)
+    flat = frames.reshape(len(frames), -1)
+    out = np.empty((n, flat.shape[1]))
+    for k in range(flat.shape[1]):
+        out[:, k] = np.interp(target, t, flat[:, k])
+    return out.reshape((n,) + frames.shape[1:])
+
+
+def load_template_file(path):
+    """讀取樣板；有 timestamps 時依時間戳、否則依 fps 欄位重新取樣到 TEMPLATE_FPS"""
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    template_id = os.path.splitext(os.path.basename(path))[0]
+    frames = np.asarray(doc["frames"])
+    timestamps = doc.get("timestamps")
+    if timestamps is None:
+        fps = float(doc.get("fps", TEMPLATE_FPS))
+        if fps != TEMPLATE_FPS:
+            timestamps = np.arange(len(frames)) / fps
+    if timestamps is not None and len(timestamps) == len(frames) and len(frames) > 1:
+        frames = resample_to_fps(frames, timestamps)
+    return GestureTemplate(template_id, doc.get("gesture", template_id), frames,
+                           float(doc.get("threshold", DEFAULT_THRESHOLD)))
+
+
+def load_library(directory):
+    """讀取目錄下所有 *.json 樣板；目錄不存在時回傳空集合"""
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    return GestureLibrary([load_template_file(p) for p in paths])
+
+
+def save_template_file(path, gesture, frames, threshold=DEFAULT_THRESHOLD, fps=TEMPLATE_FPS, timestamps=None):
+    """儲存原始骨架序列（只留 xyz），正規化在載入時進行
+
+    timestamps：每幀擷取時間（秒），實際錄製時提供，載入時據以重新取樣，不依賴 fps 欄位
+    """
+    frames = np.asarray(frames)[:, :, :3]
+    doc = {"gesture": gesture, "threshold": threshold, "fps": fps}
+    if timestamps is not None:
+        doc["timestamps"] = [round(float(t - timestamps[0]), 4) for t in timestamps]
+        if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+            doc["fps"] = round((len(timestamps) - 1) / (timestamps[-1] - timestamps[0]), 2)
+    doc["frames"] = np.round(frames, 1).tolist()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+
+class GestureRecognizer:
+    """每幀餵一個骨架，回傳觸發的 (gesture, template_id, 平均每幀距離) 或 None
+
+    cooldown：同一手勢觸發後經過多少幀才可再觸發（預設為該樣板長度）
+    """
+
+    def __init__(self, library, cooldown=None):
+        self.library = library
+        self.cooldown = cooldown
+        self._joint_feats = []
+        self._pelvis = []
+        self._cooldown_until = {}
+        self._frame = 0
+        self.stats = {"frames": 0, "lb_computed": 0, "dtw_computed": 0, "dtw_abandoned": 0}
+
+    def reset(self):
+        self._joint_feats.clear()
+        self._pelvis.clear()
+
+    def update(self, skeleton):
+        self._frame += 1
+        if skeleton is None:
+            self.reset()
+            return None
+        lib = self.library
+        if not len(lib):
+            return None
+
+        joint_feats, pelvis = frame_features(skeleton)
+        self._joint_feats.append(joint_feats)
+        self._pelvis.append(pelvis)
+        if len(self._joint_feats) > lib.max_length:
+            del self._joint_feats[0]
+            del self._pelvis[0]
+        self.stats["frames"] += 1
+
+        available = len(self._joint_feats)
+        ready = np.flatnonzero(lib.lengths <= available)
+        if not len(ready):
+            return None
+
+        # 每種視窗長度只建一次查詢序列
+        queries = {}
+        for n in np.unique(lib.lengths[ready]):
+            n = int(n)
+            queries[n] = resample(sequence_features(self._joint_feats[-n:], self._pelvis[-n:]), lib.length)
+        query_stack = np.stack([queries[int(lib.lengths[k])] for k in ready])
+
+        bounds = lb_keogh(query_stack, lib.upper[ready], lib.lower[ready])
+        self.stats["lb_computed"] += len(ready)
+
+        best, best_k = math.inf, None
+        for idx in np.argsort(bounds):
+            k = int(ready[idx])
+            limit = min(best, lib.thresholds[k])
+            if bounds[idx] > limit:
+                # 依下界排序，之後的樣板只會更大
+                if bounds[idx] > best:
+                    break
+                continue
+            if self._cooldown_until.get(lib.templates[k].gesture, 0) > self._frame:
+                continue
+            self.stats["dtw_computed"] += 1
+            dist = dtw_distance(queries[int(lib.lengths[k])], lib.sequences[k], lib.band, limit)
+            if dist > limit:
+                self.stats["dtw_abandoned"] += 1
+                continue
+            if dist < best:
+                best, best_k = dist, k
+
+        if best_k is None:
+            return None
+        template = lib.templates[best_k]
+        cooldown = self.cooldown if self.cooldown is not None else template.length
+        self._cooldown_until[template.gesture] = self._frame + cooldown
+        return template.gesture, template.template_id, best / lib.length
@@ -0,0 +1,200 @@
+import atexit
+import collections
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+from utils import metricsUtil
+
+# 結構化事件記錄：取代偵測 / 列印熱路徑上的同步 print()
+# 呼叫端只做 等級過濾 → 取樣 → deque.append（GIL 下為原子操作，不取鎖、不做 I/O），
+# 由背景寫入執行緒格式化訊息、寫成 JSON lines（依大小輪替）並回顯到主控台。
+# 主控台 / 導向的 pipe 卡住時只有寫入執行緒被卡住；佇列滿了丟最舊的記錄，熱路徑不受影響。
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+LOG_DIR = os.environ.get("KINECT_LOG_DIR", "logs")  # 設為空字串則不寫檔
+LOG_LEVEL = os.environ.get("KINECT_LOG_LEVEL", "DEBUG").upper()
+LOG_CONSOLE_LEVEL = os.environ.get("KINECT_LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("KINECT_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("KINECT_LOG_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.environ.get("KINECT_LOG_QUEUE_SIZE", "10000"))
+LOG_FLUSH_INTERVAL = 0.1  # 寫入執行緒輪詢間隔（秒）
+
+
+def _parse_sample(text):
+    """"DEBUG=60,INFO=1" → {10: 60, 20: 1}：該等級每 N 筆只留 1 筆（依來源分開計數）"""
+    rates = {}
+    for item in (t for t in text.split(",") if t.strip()):
+        level, _, every = item.strip().partition("=")
+        rates[LEVELS[level.strip().upper()]] = max(1, int(every))
+    return rates
+
+
+# 預設 DEBUG 每 60 筆留 1 筆：逐幀的除錯記錄在 30fps 下約每 2 秒一筆
+LOG_SAMPLE = _parse_sample(os.environ.get("KINECT_LOG_SAMPLE", "DEBUG=60"))
+
+_min_level = LEVELS.get(LOG_LEVEL, 10)
+_console_level = LEVELS.get(LOG_CONSOLE_LEVEL, 20)
+_level_names = {v: k for k, v in LEVELS.items()}
+_queue = collections.deque(maxlen=LOG_QUEUE_SIZE)
+_sample_counts = {}
+_dropped = 0
+_process_name = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+_writer = None
+_writer_lock = threading.Lock()
+_drain_lock = threading.Lock()
+_file = None
+_file_path = None
+
+
+def set_process_name(name):
+    """記錄檔名與每筆記錄的 proc 欄位（worker 行程須在第一筆記錄前設定）"""
+    global _process_name
+    _process_name = name
+
+
+def log(level, source, msg, **fields):
+    """送出一筆記錄（不阻塞）
+
+    msg 可含 {欄位} 佔位，由寫入執行緒以 fields 格式化，熱路徑不做字串格式化：
+        logUtil.info("Event", "🦵 [Event:{sensor}] 偵測到前踢！({leg})", sensor=SENSOR_ID, leg=leg)
+    """
+    global _dropped
+    if level < _min_level:
+        return
+    every = LOG_SAMPLE.get(level)
+    if every is not None and every > 1:
+        key = (level, source)
+        n = _sample_counts.get(key, 0)
+        _sample_counts[key] = n + 1
+        if n % every:
+            return
+    if len(_queue) >= LOG_QUEUE_SIZE:
+        _dropped += 1
+    _queue.append((time.time(), level, source, msg, fields))
+    if _writer is None:
+        _start_writer()
+
+
+def debug(source, msg, **fields):
+    log(10, source, msg, **fields)
+
+
+def info(source, msg, **fields):
+    log(20, source, msg, **fields)
+
+
+def warning(source, msg, **fields):
+    log(30, source, msg, **fields)
+
+
+def error(source, msg, **fields):
+    log(40, source, msg, **fields)
+
+
+def dropped():
+    return _dropped
+
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            return
+        _writer = threading.Thread(target=_writer_worker, name="log-writer", daemon=True)
+        _writer.start()
+
+
+def _format(record):
+    ts, level, source, msg, fields = record
+    try:
+        text = msg.format(**fields) if fields else msg
+    except (KeyError, IndexError, ValueError):
+        text = msg
+    doc = {
+        "ts": datetime.datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+        "level": _level_names.get(level, str(level)),
+        "proc": _process_name,
+        "src": source,
+        "msg": text,
+    }
+    for key, value in fields.items():
+        doc.setdefault(key, value)
+    return level, text, doc
+
+
+def _open_file():
+    global _file, _file_path
+    os.makedirs(LOG_DIR, exist_ok=True)
+    _file_path = os.path.join(LOG_DIR, f"{_process_name}.jsonl")
+    _file = open(_file_path, "a", encoding="utf-8")
+
+
+def _rotate():
+    """<proc>.jsonl → <proc>.jsonl.1 → … → .LOG_BACKUPS（最舊的刪除）"""
+    global _file
+    _file.close()
+    _file = None
+    for i in range(LOG_BACKUPS - 1, 0, -1):
+        src = f"{_file_path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{_file_path}.{i + 1}")
+    if LOG_BACKUPS > 0:
+        os.replace(_file_path, f"{_file_path}.1")
+    else:
+        os.remove(_file_path)
+    _open_file()
+
+
+def _drain():
+    """取出佇列中所有記錄寫檔 / 回顯，回傳筆數"""
+    count = 0
+    with _drain_lock:
+        while True:
+            try:
+                record = _queue.popleft()
+            except IndexError:
+                break
+            level, text, doc = _format(record)
+            if LOG_DIR:
+                try:
+                    if _file is None:
+                        _open_file()
+                    _file.write(json.dumps(doc, ensure_ascii=False, default=str) + "\n")
+                except OSError:
+                    pass
+            if level >= _console_level:
+                try:
+                    print(text, flush=True)
+                except (OSError, ValueError):
+                    pass
+            count += 1
+        if count and _file is not None:
+            try:
+                _file.flush()
+                if _file.tell() >= LOG_MAX_BYTES:
+                    _rotate()
+            except OSError:
+                pass
+    return count
+
+
+def _writer_worker():
+    """【記錄寫入 Worker】定期把佇列中的記錄寫成 JSON lines 並回顯主控台"""
+    while True:
+        count = _drain()
+        if count:
+            metricsUtil.inc("log_records", count)
+            metricsUtil.set_gauge("log_dropped", _dropped)
+        else:
+            time.sleep(LOG_FLUSH_INTERVAL)
+
+
+@atexit.register
+def flush():
+    """寫出佇列中剩下的記錄（結束前 / 測試時呼叫）"""
+    _drain()
@@ -0,0 +1,65 @@
+import collections
+import threading
+import time
+
+# 簡易指標登錄（counter / gauge / 延遲分位數），供 /metrics 端點輸出 JSON
+SUMMARY_WINDOW = 2048  # 分位數只看最近的樣本數
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_samples = {}
+_sample_counts = {}
+_start_time = time.time()
+
+
+def inc(name, value=1):
+    """累加 counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """設定 gauge 目前值"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    """記錄一個樣本（例如延遲 ms），snapshot 時輸出 p50 / p90 / p99"""
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = collections.deque(maxlen=SUMMARY_WINDOW)
+        samples.append(value)
+        _sample_counts[name] = _sample_counts.get(name, 0) + 1
+
+
+def _percentile(sorted_values, p):
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def snapshot():
+    """回傳目前所有指標的快照（dict，可直接 jsonify）"""
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items() if values}
+        counts = dict(_sample_counts)
+        result = {
+            "uptime_sec": round(time.time() - _start_time, 3),
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
+    for values in samples.values():
+        values.sort()
+    result["summaries"] = {
+        name: {
+            "count": counts[name],
+            "p50": round(_percentile(values, 50), 3),
+            "p90": round(_percentile(values, 90), 3),
+            "p99": round(_percentile(values, 99), 3),
+            "max": round(values[-1], 3),
+        }
+        for name, values in samples.items()
+    }
+    return result
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 持久化列印佇列（本機 SQLite，WAL 模式）：多個 server.py 行程都可接受 /api/print 並寫入，
+# 由唯一的「印表機擁有者」行程分批認領、列印、標記完成 / 失敗。
+#
+# 工作狀態：
+#   queued   等待列印
+#   claimed  已被擁有者認領（尚未送出到印表機）
+#   printing 已開始送出到印表機
+#   done / failed
+# 擁有者重啟時 claimed 放回 queued（還沒印，可安全重來）；printing 代表當機當下可能已經出紙，
+# 標為 failed 不自動重印 —— 佇列中的工作恰好印一次，中斷的那一張不會印兩次。
+#
+# 同時只能有一個擁有者：owner_lease 表只有一列，擁有者定期續約，其他行程在租約逾時前只能待命。
+# 所有狀態轉換都帶 claimed_by 條件，租約逾時被接手後，原擁有者手上的工作無法再標為 printing。
+
+PRINT_QUEUE_DB = os.environ.get("PRINT_QUEUE_DB", "print_queue.db")
+# FULL：每次寫入都 fsync，斷電重開機也不遺失已回應的請求；NORMAL 較快但只保證行程當掉不遺失
+PRINT_QUEUE_SYNC = os.environ.get("PRINT_QUEUE_SYNC", "FULL").upper()
+BUSY_TIMEOUT_MS = 5000
+LEASE_TTL = 15.0  # 秒；擁有者超過此時間未續約即視為已失效，可由其他行程接手
+
+QUEUED = "queued"
+CLAIMED = "claimed"
+PRINTING = "printing"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    idem_key    TEXT NOT NULL UNIQUE,
+    payload     TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'queued',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    created     REAL NOT NULL,
+    claimed_by  TEXT,
+    claimed_at  REAL,
+    finished    REAL,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state_id ON jobs (state, id);
+CREATE TABLE IF NOT EXISTS owner_lease (
+    id          INTEGER PRIMARY KEY CHECK (id = 1),
+    owner       TEXT NOT NULL,
+    expires     REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect():
+    """每個行程一條連線（以鎖序列化；跨行程由 SQLite 檔案鎖 + busy_timeout 協調）"""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(PRINT_QUEUE_DB, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                               isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={PRINT_QUEUE_SYNC}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def init():
+    """建立資料庫 / 資料表（可重複呼叫）"""
+    with _lock:
+        _connect()
+
+
+def _job_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue(payload, idem_key):
+    """寫入一筆工作，回傳 (job_id, created)；相同 idem_key 已存在時不重複建立，created=False"""
+    with _lock:
+        conn = _connect()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO jobs (idem_key, payload, created) VALUES (?, ?, ?)",
+            (idem_key, json.dumps(payload, ensure_ascii=False), time.time()))
+        if cur.rowcount == 1:
+            return cur.lastrowid, True
+        row = conn.execute("SELECT id FROM jobs WHERE idem_key = ?", (idem_key,)).fetchone()
+        return row["id"], False
+
+
+def claim_batch(owner, limit):
+    """認領最多 limit 筆 queued 工作（依建立順序），回傳工作清單"""
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT * FROM jobs WHERE state = ? ORDER BY id LIMIT ?",
+                                (QUEUED, limit)).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE jobs SET state = ?, claimed_by = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(CLAIMED, owner, time.time(), row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return [_job_dict(row) for row in rows]
+
+
+def _lease_holder(conn, now):
+    row = conn.execute("SELECT owner FROM owner_lease WHERE id = 1 AND expires > ?", (now,)).fetchone()
+    return row["owner"] if row is not None else None
+
+
+def acquire_lease(owner, ttl=LEASE_TTL):
+    """取得或續約擁有者租約，回傳 (是否持有, 目前持有者)；其他擁有者的租約未逾時則不搶"""
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            holder = _lease_holder(conn, now)
+            if holder is None or holder == owner:
+                conn.execute("INSERT OR REPLACE INTO owner_lease (id, owner, expires) VALUES (1, ?, ?)",
+                             (owner, now + ttl))
+                holder = owner
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return holder == owner, holder
+
+
+def release_lease(owner):
+    """擁有者正常結束時交還租約，其他行程不必等到逾時即可接手"""
+    with _lock:
+        cur = _connect().execute("DELETE FROM owner_lease WHERE id = 1 AND owner = ?", (owner,))
+        return cur.rowcount == 1
+
+
+def _transition(job_id, owner, from_state, to_state, **columns):
+    sets = ", ".join(["state = ?"] + [f"{name} = ?" for name in columns])
+    with _lock:
+        cur = _connect().execute(f"UPDATE jobs SET {sets} WHERE id = ? AND state = ? AND claimed_by = ?",
+                                 (to_state, *columns.values(), job_id, from_state, owner))
+        return cur.rowcount == 1
+
+
+def mark_printing(job_id, owner):
+    """開始送出到印表機前呼叫；之後當機的話此工作不會被自動重印
+
+    回傳 False 代表工作已不屬於 owner（租約逾時被接手、已放回佇列），呼叫端不可送出列印。
+    """
+    return _transition(job_id, owner, CLAIMED, PRINTING)
+
+
+def mark_done(job_id, owner):
+    return _transition(job_id, owner, PRINTING, DONE, finished=time.time(), error=None)
+
+
+def mark_failed(job_id, owner, error, from_state=PRINTING):
+    return _transition(job_id, owner, from_state, FAILED, finished=time.time(), error=str(error))
+
+
+def release(job_id, owner):
+    """認領後尚未送出（例如印表機未連線）：放回佇列，保留原本順序"""
+    return _transition(job_id, owner, CLAIMED, QUEUED, claimed_by=None, claimed_at=None)
+
+
+def recover(owner):
+    """擁有者取得租約後、還沒有送出中的工作時呼叫：未完成的 claimed 放回佇列、printing 標為失敗，
+    回傳 (放回筆數, 標為失敗筆數)
+
+    持有租約代表先前的擁有者都已失效；未持有租約時拒絕回收（RuntimeError），以免把存活擁有者的工作放回佇列。
+    """
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            holder = _lease_holder(conn, time.time())
+            if holder != owner:
+                raise RuntimeError(f"擁有者租約由 {holder} 持有，{owner} 不可回收工作")
+            requeued = conn.execute(
+                "UPDATE jobs SET state = ?, claimed_by = NULL, claimed_at = NULL WHERE state = ?",
+                (QUEUED, CLAIMED)).rowcount
+            interrupted = conn.execute(
+                "UPDATE jobs SET state = ?, finished = ?, error = ? WHERE state = ?",
+                (FAILED, time.time(), "列印中斷（擁有者行程重啟），可能已出紙，不自動重印", PRINTING)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return requeued, interrupted
+
+
+def get_job(job_id):
+    with _lock:
+        return _job_dict(_connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def stats():
+    """各狀態工作數"""
+    with _lock:
+        rows = _connect().execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+    result = {state: 0 for state in (QUEUED, CLAIMED, PRINTING, DONE, FAILED)}
+    result.update({row["state"]: row["n"] for row in rows})
+    return result
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from utils import logUtil, metricsUtil
+
+# 分段啟動的元件狀態：伺服器先 bind，SDK / 裝置 / 印表機等在背景初始化，
+# /health 只回答「行程活著」，/ready 在所有已登記元件就緒前回 503
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+def _process_start_time():
+    """(起算時間, 來源)：行程建立時間（含直譯器啟動與 import 耗時）；沒有 psutil 時退回本模組載入時間"""
+    try:
+        import psutil
+        return psutil.Process().create_time(), "process_create_time"
+    except Exception:
+        return time.time(), "module_import"
+
+
+_lock = threading.Lock()
+_components = {}       # name -> dict(state, detail, since)
+_registered = False    # 有登記元件才判定整體就緒（worker 行程只回報個別元件）
+_start_time, _start_clock = _process_start_time()  # /ready 回報 start_clock，耗時才知道從哪裡起算
+_ready_logged = False
+_seen_ready = set()    # 已記錄過首次就緒耗時的元件（重啟後再就緒不覆寫）
+
+
+def register(*names):
+    """登記需要就緒的元件；行程內有登記過元件才會判定整體就緒"""
+    global _registered
+    with _lock:
+        _registered = True
+        for name in names:
+            _components.setdefault(name, {"state": PENDING, "detail": None, "since": time.time()})
+
+
+def _set(name, state, detail):
+    global _ready_logged
+    now = time.time()
+    with _lock:
+        previous = _components.get(name)
+        if previous is not None and previous["state"] == state and previous["detail"] == detail:
+            return False
+        _components[name] = {"state": state, "detail": detail, "since": now}
+        all_ready = _registered and all(c["state"] == READY for c in _components.values())
+        first_ready = all_ready and not _ready_logged
+        if first_ready:
+            _ready_logged = True
+        first_component_ready = state == READY and name not in _seen_ready
+        if first_component_ready:
+            _seen_ready.add(name)
+    if first_component_ready:
+        metricsUtil.set_gauge(f"startup.{name}_sec", round(now - _start_time, 3))
+    if first_ready:
+        elapsed = now - _start_time
+        metricsUtil.set_gauge("startup_to_ready_sec", round(elapsed, 3))
+        logUtil.info("Ready", "✅ [Ready] 所有元件就緒，啟動耗時 {elapsed:.2f} 秒", elapsed=elapsed)
+    return True
+
+
+def set_pending(name, detail=None):
+    """元件重新初始化中（例如 worker 行程重啟）"""
+    _set(name, PENDING, detail)
+
+
+def set_ready(name, detail=None):
+    _set(name, READY, detail)
+
+
+def set_failed(name, error):
+    if _set(name, FAILED, str(error)):
+        logUtil.error("Ready", "❌ [Ready] {component} 初始化失敗: {error}", component=name, error=str(error))
+
+
+def status():
+    """/ready 回應內容：整體是否就緒 + 各元件狀態"""
+    now = time.time()
+    with _lock:
+        components = {
+            name: {"state": c["state"], "detail": c["detail"], "for_sec": round(now - c["since"], 3)}
+            for name, c in _components.items()
+        }
+    return {
+        "ready": _registered and all(c["state"] == READY for c in components.values()),
+        "uptime_sec": round(now - _start_time, 3),
+        "start_clock": _start_clock,
+        "components": components,
+    }
@@ -0,0 +1,100 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 骨架幀共享記憶體環狀緩衝區：擷取行程寫入、偵測行程直接以 numpy view 讀取（不經 pickle / 複製）
+# 版面：header(write_seq, idle) + RING_SLOTS 個 slot(seq, capture_ts, has_body, skeleton[32x8] float32)
+# 寫入時先把 slot seq 設為 -1、寫完資料再填回幀序號；讀取端以 slot seq 判斷資料是否完整且未被覆寫
+
+NUM_JOINTS = 32
+JOINT_FIELDS = 8   # x, y, z, qw, qx, qy, qz, confidence
+RING_SLOTS = 64    # 30fps 約 2 秒；偵測端落後超過這個量才會被覆寫
+
+_HEADER = np.dtype([("write_seq", "<i8"), ("idle", "<i8")])
+_SLOT = np.dtype([
+    ("seq", "<i8"),
+    ("capture_ts", "<f8"),
+    ("has_body", "<i8"),
+    ("skeleton", "<f4", (NUM_JOINTS, JOINT_FIELDS)),
+])
+
+
+class SkeletonRing:
+    """以 create() 建立（擷取端，負責 unlink），以 attach(name) 連上（偵測端）"""
+
+    def __init__(self, shm, slots, owner):
+        self.shm = shm
+        self.slots = slots
+        self.owner = owner
+        self._header = np.ndarray((1,), dtype=_HEADER, buffer=shm.buf, offset=0)
+        self._ring = np.ndarray((slots,), dtype=_SLOT, buffer=shm.buf, offset=_HEADER.itemsize)
+
+    @staticmethod
+    def size_for(slots):
+        return _HEADER.itemsize + _SLOT.itemsize * slots
+
+    @classmethod
+    def create(cls, slots=RING_SLOTS):
+        shm = shared_memory.SharedMemory(create=True, size=cls.size_for(slots))
+        ring = cls(shm, slots, owner=True)
+        ring._header[0] = (0, 0)
+        ring._ring["seq"] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots=RING_SLOTS):
+        # spawn 出的偵測行程與擷取端共用同一個 resource_tracker，attach 的登記與 create 的是同一筆，
+        # 不可在這裡取消登記（會連擷取端的一起取消，擷取端異常結束時就沒人回收）
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, skeleton, frame_seq, capture_ts, idle=False):
+        """寫入一幀（skeleton 為 None 表示無人）"""
+        idx = frame_seq % self.slots
+        ring = self._ring
+        ring["seq"][idx] = -1
+        ring["capture_ts"][idx] = capture_ts
+        if skeleton is not None:
+            ring["skeleton"][idx] = skeleton[:NUM_JOINTS, :JOINT_FIELDS]
+            ring["has_body"][idx] = 1
+        else:
+            ring["has_body"][idx] = 0
+        ring["seq"][idx] = frame_seq
+        self._header["idle"][0] = 1 if idle else 0
+        self._header["write_seq"][0] = frame_seq
+
+    def latest_seq(self):
+        return int(self._header["write_seq"][0])
+
+    def read(self, frame_seq):
+        """讀取指定幀：回傳 (capture_ts, skeleton view 或 None, idle)；該幀正在寫入或已被覆寫時回傳 None
+
+        skeleton 是共享記憶體的 view，寫入端繞一圈後會被覆寫：複製後須以 is_current() 確認
+        """
+        idx = frame_seq % self.slots
+        if int(self._ring["seq"][idx]) != frame_seq:
+            return None
+        capture_ts = float(self._ring["capture_ts"][idx])
+        skeleton = self._ring["skeleton"][idx] if self._ring["has_body"][idx] else None
+        return capture_ts, skeleton, bool(self._header["idle"][0])
+
+    def is_current(self, frame_seq):
+        """讀完 / 處理完後確認該 slot 沒有在期間被覆寫"""
+        return int(self._ring["seq"][frame_seq % self.slots]) == frame_seq
+
+    def close(self):
+        # 擁有者先 unlink（移除名稱並取消 resource_tracker 登記），之後關閉對應失敗也不會遺留 /dev/shm
+        if self.owner:
+            self.shm.unlink()
+        # numpy view 會持有 buffer，須先釋放才能關閉
+        self._header = None
+        self._ring = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 其他執行緒仍持有 view（結束中的擷取執行緒），交給行程結束時釋放
+            pass
@@ -0,0 +1,239 @@
+import math
+import time
+
+import numpy as np
+
+# 合成骨架來源：介面模仿 pykinect 的 device / bodyTracker / body_frame，
+# 讓 main.py 在沒有 Kinect 的機器上也能跑完整流程（壓力測試、開發用）
+
+NUM_JOINTS = 32  # K4ABT_JOINT_COUNT
+
+# K4ABT 關節編號（與 Azure Kinect Body Tracking SDK 相同）
+PELVIS = 0
+SPINE_NAVEL = 1
+SPINE_CHEST = 2
+NECK = 3
+SHOULDER_LEFT = 5
+ELBOW_LEFT = 6
+WRIST_LEFT = 7
+HAND_LEFT = 8
+SHOULDER_RIGHT = 12
+ELBOW_RIGHT = 13
+WRIST_RIGHT = 14
+HAND_RIGHT = 15
+HIP_LEFT = 18
+KNEE_LEFT = 19
+ANKLE_LEFT = 20
+FOOT_LEFT = 21
+HIP_RIGHT = 22
+KNEE_RIGHT = 23
+ANKLE_RIGHT = 24
+FOOT_RIGHT = 25
+HEAD = 26
+
+LEG_LENGTH = 900.0   # 髖部到腳踝（mm）
+KICK_ANGLE = 55.0    # 前踢時整條腿往前抬的角度（度）
+
+# 站姿骨架（mm，相機座標：Y 向下、Z 向前）
+_STANDING = {
+    PELVIS: (0, 0, 2000),
+    SPINE_NAVEL: (0, -200, 2000),
+    SPINE_CHEST: (0, -400, 2000),
+    NECK: (0, -600, 2000),
+    HEAD: (0, -750, 2000),
+    SHOULDER_LEFT: (-180, -550, 2000),
+    ELBOW_LEFT: (-200, -280, 2000),
+    WRIST_LEFT: (-210, -50, 2000),
+    HAND_LEFT: (-210, 30, 2000),
+    SHOULDER_RIGHT: (180, -550, 2000),
+    ELBOW_RIGHT: (200, -280, 2000),
+    WRIST_RIGHT: (210, -50, 2000),
+    HAND_RIGHT: (210, 30, 2000),
+    HIP_LEFT: (-100, 0, 2000),
+    KNEE_LEFT: (-100, 450, 2000),
+    ANKLE_LEFT: (-100, 900, 2000),
+    FOOT_LEFT: (-100, 950, 1900),
+    HIP_RIGHT: (100, 0, 2000),
+    KNEE_RIGHT: (100, 450, 2000),
+    ANKLE_RIGHT: (100, 900, 2000),
+    FOOT_RIGHT: (100, 950, 1900),
+}
+
+
+def standing_skeleton(offset_z=0.0):
+    """回傳站姿骨架 (32, 8)：x, y, z, qw, qx, qy, qz, confidence"""
+    skeleton = np.zeros((NUM_JOINTS, 8), dtype=np.float32)
+    skeleton[:, 3] = 1.0
+    skeleton[:, 7] = 2.0  # K4ABT_JOINT_CONFIDENCE_MEDIUM
+    for joint, pos in _STANDING.items():
+        skeleton[joint, :3] = pos
+    # 未定義的關節（手指、臉部）沿用最近的主要關節位置
+    skeleton[9:11, :3] = skeleton[HAND_LEFT, :3]
+    skeleton[4, :3] = skeleton[SHOULDER_LEFT, :3]
+    skeleton[16:18, :3] = skeleton[HAND_RIGHT, :3]
+    skeleton[11, :3] = skeleton[SHOULDER_RIGHT, :3]
+    skeleton[27:32, :3] = skeleton[HEAD, :3]
+    skeleton[:, 2] += offset_z
+    return skeleton
+
+
+def raise_hand(skeleton, side='right'):
+    """把單手舉過頭"""
+    if side == 'left':
+        shoulder, joints = SHOULDER_LEFT, (ELBOW_LEFT, WRIST_LEFT, HAND_LEFT)
+    else:
+        shoulder, joints = SHOULDER_RIGHT, (ELBOW_RIGHT, WRIST_RIGHT, HAND_RIGHT)
+    x, y, z = skeleton[shoulder, :3]
+    for i, joint in enumerate(joints):
+        skeleton[joint, :3] = (x, y - 270 * (i + 1), z)
+    return skeleton
+
+
+def kick_leg(skeleton, side='left', angle=KICK_ANGLE):
+    """整條腿打直往前抬 angle 度（前踢）"""
+    if side == 'left':
+        hip, knee, ankle, foot = HIP_LEFT, KNEE_LEFT, ANKLE_LEFT, FOOT_LEFT
+    else:
+        hip, knee, ankle, foot = HIP_RIGHT, KNEE_RIGHT, ANKLE_RIGHT, FOOT_RIGHT
+    x, y, z = skeleton[hip, :3]
+    rad = math.radians(angle)
+    for joint, length in ((knee, LEG_LENGTH / 2), (ankle, LEG_LENGTH), (foot, LEG_LENGTH + 50)):
+        skeleton[joint, :3] = (x, y + length * math.cos(rad), z - length * math.sin(rad))
+    return skeleton
+
+
+class SyntheticCapture:
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+
+class SyntheticBody:
+    def __init__(self, skeleton):
+        self._skeleton = skeleton
+
+    def numpy(self):
+        return self._skeleton
+
+
+class SyntheticBodyFrame:
+    def __init__(self, skeletons):
+        self._skeletons = skeletons
+
+    def get_num_bodies(self):
+        return len(self._skeletons)
+
+    def get_body(self, body_id=0):
+        return SyntheticBody(self._skeletons[body_id])
+
+
+class SyntheticDevice:
+    """取代 pykinect device：update() 回傳帶時間戳的 capture"""
+
+    def update(self):
+        return SyntheticCapture(time.time())
+
+
+class SyntheticBodyTracker:
+    """取代 pykinect bodyTracker：依時間循環產生 舉手 → 站立 → 前踢 → 站立 的骨架
+
+    motion_period:  一個動作循環的秒數（四個階段各佔 1/4）
+    num_bodies:     畫面中的人數（第一個人最近，其餘人往後排）
+    presence_cycle: (有人秒數, 無人秒數)，模擬來客與夜間無人；None 表示一直有人
+    """
+
+    def __init__(self, motion_period=4.0, num_bodies=1, presence_cycle=None):
+        self.motion_period = motion_period
+        self.num_bodies = num_bodies
+        self.presence_cycle = presence_cycle
+        self._t0 = time.time()
+
+    def update(self, capture=None):
+        now = capture.timestamp if capture is not None else time.time()
+        if self.presence_cycle is not None:
+            present, absent = self.presence_cycle
+            if (now - self._t0) % (present + absent) >= present:
+                return SyntheticBodyFrame([])
+        phase = ((now - self._t0) % self.motion_period) / self.motion_period
+        skeletons = []
+        for i in range(self.num_bodies):
+            skeleton = standing_skeleton(offset_z=800.0 * i)
+            if i == 0:
+                if phase < 0.25:
+                    raise_hand(skeleton, 'right')
+                elif 0.5 <= phase < 0.75:
+                    kick_leg(skeleton, 'left')
+            skeletons.append(skeleton)
+        return SyntheticBodyFrame(skeletons)
+
+
+# --- 合成手勢序列（DTW 樣板 / 基準測試用）---
+GESTURES = ("wave", "squat", "jump", "raise_hand", "kick")
+
+
+def _shift(skeleton, joints, dy=0.0, dz=0.0):
+    skeleton[joints, 1] += dy
+    skeleton[joints, 2] += dz
+
+
+_UPPER_BODY = [j for j in range(NUM_JOINTS) if j not in (KNEE_LEFT, ANKLE_LEFT, FOOT_LEFT,
+                                                          KNEE_RIGHT, ANKLE_RIGHT, FOOT_RIGHT)]
+
+
+def gesture_skeleton(name, t, amplitude=1.0):
+    """手勢 name 在進度 t（0~1）時的骨架"""
+    skeleton = standing_skeleton()
+    bump = math.sin(math.pi * t)  # 0 → 1 → 0
+    if name == "wave":
+        x, y, z = skeleton[SHOULDER_RIGHT, :3]
+        skeleton[ELBOW_RIGHT, :3] = (x + 150, y - 100, z)
+        sway = 180 * amplitude * math.sin(4 * math.pi * t)
+        skeleton[WRIST_RIGHT, :3] = (x + 150 + sway * 0.8, y - 330, z)
+        skeleton[HAND_RIGHT, :3] = (x + 150 + sway, y - 420, z)
+    elif name == "squat":
+        depth = 350 * amplitude * bump
+        _shift(skeleton, _UPPER_BODY, dy=depth)
+        _shift(skeleton, [KNEE_LEFT, KNEE_RIGHT], dy=depth / 2, dz=-0.6 * depth)
+    elif name == "jump":
+        _shift(skeleton, list(range(NUM_JOINTS)), dy=-300 * amplitude * bump)
+    elif name == "raise_hand":
+        x, y, z = skeleton[SHOULDER_RIGHT, :3]
+        lift = bump * amplitude
+        for i, joint in enumerate((ELBOW_RIGHT, WRIST_RIGHT, HAND_RIGHT)):
+            length = 270 * (i + 1)
+            skeleton[joint, :3] = (x + 30, y + length * math.cos(math.pi * min(lift, 1.0)), z)
+    elif name == "kick":
+        kick_leg(skeleton, 'left', angle=KICK_ANGLE * amplitude * bump)
+    else:
+        raise ValueError(f"未知的合成手勢: {name}")
+    return skeleton
+
+
+def gesture_frames(name, n_frames=30, rng=None, noise=10.0, amplitude=None, yaw=None, offset=None):
+    """產生一段手勢骨架序列 (n_frames, 32, 8)；給 rng 時隨機擾動幅度、朝向、站位與關節雜訊"""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    amplitude = amplitude if amplitude is not None else rng.uniform(0.85, 1.15)
+    yaw = math.radians(yaw if yaw is not None else rng.uniform(-15, 15))
+    offset = offset if offset is not None else (rng.uniform(-300, 300), 0.0, rng.uniform(-300, 300))
+    c, s = math.cos(yaw), math.sin(yaw)
+    frames = []
+    for i in range(n_frames):
+        skeleton = gesture_skeleton(name, i / max(1, n_frames - 1), amplitude)
+        pelvis = skeleton[PELVIS, :3].copy()
+        rel = skeleton[:, :3] - pelvis
+        x, z = rel[:, 0].copy(), rel[:, 2].copy()
+        rel[:, 0] = c * x + s * z
+        rel[:, 2] = -s * x + c * z
+        skeleton[:, :3] = rel + pelvis + np.asarray(offset)
+        if noise:
+            skeleton[:, :3] += rng.normal(0.0, noise, size=(NUM_JOINTS, 3))
+        frames.append(skeleton)
+    return np.stack(frames)
+
+
+def idle_frames(n_frames, rng=None, noise=10.0):
+    """站立不動（含雜訊）的序列，用來測誤觸發"""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    base = standing_skeleton()
+    frames = np.repeat(base[None], n_frames, axis=0)
+    frames[:, :, :3] += rng.normal(0.0, noise, size=(n_frames, NUM_JOINTS, 3))
+    return frames
@@ -0,0 +1,124 @@
+import collections
+import json
+import os
+import signal
+import threading
+import time
+
+# 逐幀追蹤：把各執行緒的 span 記錄到固定大小的環狀緩衝區，需要時匯出成
+# Chrome / Perfetto trace-event JSON（chrome://tracing 或 ui.perfetto.dev 開啟）
+# 預設關閉；關閉時 span() 只回傳共用的空物件，幾乎沒有額外成本
+
+TRACE_ENABLED = os.environ.get("KINECT_TRACE", "0") == "1"
+TRACE_BUFFER_SIZE = int(os.environ.get("KINECT_TRACE_SIZE", "200000"))
+TRACE_DIR = os.environ.get("KINECT_TRACE_DIR", "traces")
+
+_enabled = TRACE_ENABLED
+_ring = collections.deque(maxlen=TRACE_BUFFER_SIZE)
+_thread_names = {}
+_process_name = "python"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        complete(self.name, self.cat, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_process_name(name):
+    global _process_name
+    _process_name = name
+
+
+def now_ns():
+    return time.perf_counter_ns()
+
+
+def span(name, cat="main", args=None):
+    """with traceUtil.span("device.update", "acquisition"): ..."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def complete(name, cat, start_ns, end_ns, args=None):
+    """記錄一段已知起訖時間的 span（例如 Flask request 的 before / teardown）"""
+    if not _enabled:
+        return
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    # deque.append 在 GIL 下為原子操作，不需額外加鎖
+    _ring.append((name, cat, start_ns, end_ns - start_ns, tid, args))
+
+
+def snapshot_events(pid=None):
+    """把環狀緩衝區轉成 trace-event dict 清單"""
+    pid = os.getpid() if pid is None else pid
+    records = list(_ring)
+    events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": _process_name}}]
+    for tid, tname in list(_thread_names.items()):
+        events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": tname}})
+    for name, cat, start_ns, dur_ns, tid, args in records:
+        event = {"ph": "X", "name": name, "cat": cat, "pid": pid, "tid": tid,
+                 "ts": start_ns / 1000.0, "dur": dur_ns / 1000.0}
+        if args:
+            event["args"] = args
+        events.append(event)
+    return events
+
+
+def dump(path=None, extra_events=None):
+    """匯出目前緩衝區內容為 JSON 檔，回傳檔案路徑"""
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(TRACE_DIR, f"trace-{_process_name}-{stamp}.json")
+    events = snapshot_events()
+    if extra_events:
+        events.extend(extra_events)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def install_signal_handler(on_dump=None):
+    """以訊號觸發匯出（POSIX: SIGUSR1，Windows: Ctrl+Break / SIGBREAK），須在主執行緒呼叫"""
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return None
+
+    def handler(_signum, _frame):
+        path = on_dump() if on_dump is not None else dump()
+        print(f"📝 [Trace] 已匯出 {path}")
+
+    signal.signal(signum, handler)
+    return signum